@@ -8,8 +8,10 @@ from typing import Callable, Dict, Any, Awaitable
 
 from app.bot.middlewares.global_error import GlobalErrorMiddleware
 from app.bot.middlewares.logging import LoggingMiddleware
+from app.bot.middlewares.rate_limit import TelegramRateLimitMiddleware
 from app.bot.middlewares.throttling import ThrottlingMiddleware
 from app.config import settings
+from app.utils.bot_session import new_bot_session
 from app.utils.cache import cache
 from app.utils.permissions import is_group_admin
 from app.utils.redis_streams import redis_streams 
@@ -99,8 +101,11 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
 
     bot = Bot(
         token=settings.bot_token,
+        session=new_bot_session(),
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
+    # Общий лимит и пауза по 429 для всех исходящих запросов к Bot API
+    bot.session.middleware(TelegramRateLimitMiddleware())
 
     # FSM Storage
     storage = None
@@ -140,6 +145,12 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
     user_bot.register_handlers(dp)
     service_messages.register_handlers(dp)
 
+    # Кеш тех-топиков для быстрого отсева сообщений в tech_mirror
+    try:
+        await tech_mirror.load_known_tech_locations()
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось загрузить тех-топики, фильтр отключен: {e}")
+
     logger.info("🛡️ GlobalErrorMiddleware активирован")
     logger.info("✅ Бот успешно настроен")
 
@@ -148,6 +159,11 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
 
 async def shutdown_bot():
     """Корректное завершение работы бота."""
+    try:
+        await user_poll.flush_feedback_queue()
+    except Exception as e:
+        logger.error("❌ Ошибка сброса очереди отзывов: %s", e)
+
     try:
         await redis_streams.disconnect()
         logger.info("✅ Redis Streams отключен")
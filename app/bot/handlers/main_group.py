@@ -13,16 +13,17 @@ from aiogram.exceptions import (
     TelegramBadRequest,
 )
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from sqlalchemy import select
+from sqlalchemy import inspect as sa_inspect, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
 
 from app.config import settings
 from app.db.database import db_manager
-from app.db.models import Ticket, TechThread, TicketStatus, Technician, User
+from app.db.models import Ticket, TechThread, TicketMessage, TicketStatus, Technician, User
+from app.db.crud.message import TicketMessageCRUD
 from app.db.crud.ticket import (
-    get_all_tech_threads_for_ticket
-    
+    get_all_tech_threads_for_ticket,
+    get_tech_thread_by_user_and_tech,
 )
 from app.db.crud.tech import (
     get_technicians,
@@ -32,42 +33,19 @@ from app.db.crud.tech import (
 from app.db.crud.user import get_or_create_user
 from app.utils.cache import cache
 from app.utils.redis_streams import redis_streams
+from app.utils.telegram import (
+    extract_consonants,
+    extract_media,
+    get_service_fields,
+    status_emoji,
+)
 
 logger = logging.getLogger(__name__)
 
-
 # ─────────────────────────────────────────────
 #  Вспомогательные функции
 # ─────────────────────────────────────────────
 
-def _extract_consonants(name: str, count: int = 3) -> str:
-    """Извлечь первые N согласных букв из имени."""
-    consonants_ru = "БВГДЖЗЙКЛМНПРСТФХЦЧШЩбвгджзйклмнпрстфхцчшщ"
-    consonants_en = "BCDFGHJKLMNPQRSTVWXYZbcdfghjklmnpqrstvwxyz"
-
-    result = []
-    for char in name:
-        if char in consonants_ru or char in consonants_en:
-            result.append(char.upper())
-            if len(result) >= count:
-                break
-
-    # Если не хватает согласных, возьмем первые буквы
-    if len(result) < 2:
-        result = [c.upper() for c in name[:count] if c.isalpha()]
-
-    return "".join(result[:count]) or "???"
-
-
-def _status_emoji(status: TicketStatus) -> str:
-    """Получить эмодзи статуса."""
-    return {
-        TicketStatus.NEW: "🟢",
-        TicketStatus.WORK: "🟡",
-        TicketStatus.CLOSED: "⚪️",
-    }.get(status, "⚪️")
-
-
 def _get_tech_tag(tech: Technician | None) -> str:
     """
     Получить тег техника из согласных букв его имени.
@@ -81,7 +59,7 @@ def _get_tech_tag(tech: Technician | None) -> str:
     if tech is None:
         return "???"
     
-    return _extract_consonants(tech.name, count=3)
+    return extract_consonants(tech.name, count=3)
 
 
 def _build_topic_title(
@@ -107,7 +85,7 @@ def _build_topic_title(
         - Главная группа без техника: "🟢 [-] Иван (@ivan)"
         - Группа техника: "🟢 Иван (@ivan)"
     """
-    emoji = _status_emoji(status)
+    emoji = status_emoji(status)
     
     parts = [emoji]
 
@@ -156,6 +134,17 @@ async def _update_all_topic_titles(
     # -----------------------------------
     has_tech = ticket.assigned_tech_id is not None
 
+    tech_tag = "-"
+    if has_tech:
+        # assigned_tech обычно уже загружен вместе с тикетом — в БД идём, только
+        # если связь не загружена или устарела (техника только что сменили)
+        tech = None
+        if "assigned_tech" not in sa_inspect(ticket).unloaded:
+            tech = ticket.assigned_tech
+        if tech is None or tech.id != ticket.assigned_tech_id:
+            tech = await get_technician_by_id(session=db, tech_id=ticket.assigned_tech_id)
+        tech_tag = _get_tech_tag(tech)
+
     # -----------------------------------------------------
     # 2. Формируем итоговое имя главного топика
     # -----------------------------------------------------
@@ -163,7 +152,7 @@ async def _update_all_topic_titles(
         user=ticket.client,
         status=ticket.status,
         assigned=has_tech,
-        tech_tag=_get_tech_tag(await get_technician_by_id(session=db, tech_id=ticket.assigned_tech_id)) if has_tech else "-",
+        tech_tag=tech_tag,
     )
 
     logger.debug(f"📝 Проверка главного топика: '{main_title}'")
@@ -605,14 +594,13 @@ async def _copy_ticket_history_to_tech(
     """
 
     copied_count = 0
+    # Всё ставим в очередь одним pipeline в конце
+    payloads: list[dict] = []
 
     try:
         # 1. Получаем историю сообщений
-        from sqlalchemy import select as sql_select
-        from app.db.models import TicketMessage
-
         stmt = (
-            sql_select(TicketMessage)
+            select(TicketMessage)
             .where(TicketMessage.ticket_id == ticket.id)
             .order_by(TicketMessage.id)  # ✅ ВАЖНО: сортировка по ID, не created_at
         )
@@ -649,7 +637,6 @@ async def _copy_ticket_history_to_tech(
 
 
                     payload = {
-                        "bot_token": bot.token,
                         "target_chat_id": tech_chat_id,
                         "target_thread_id": tech_thread_id,
                         "main_thread_id": ticket.main_thread_id,
@@ -707,19 +694,15 @@ async def _copy_ticket_history_to_tech(
                             "text": final_text
                         })
 
-                    await redis_streams.enqueue(payload)
-                    copied_count += 1
+                    payloads.append(payload)
 
                 except Exception as e:
                     logger.error(f"❌ Ошибка упаковки сообщения #{msg.id}: {e}")
 
-            logger.info(f"✅ В очередь поставлено {copied_count} сообщений истории")
-
         # ========================================
         # 3. Разделитель (sequence_id = last + 1)
         # ========================================
-        await redis_streams.enqueue({
-            "bot_token": bot.token,
+        payloads.append({
             "type": "text",
             "text": "📍 <b>Конец истории</b>",
             "target_chat_id": tech_chat_id,
@@ -735,8 +718,7 @@ async def _copy_ticket_history_to_tech(
         # 4. Шапка клиента (sequence_id = last + 2)
         # ========================================
         header_text = await _get_client_header_text(ticket)
-        await redis_streams.enqueue({
-            "bot_token": bot.token,
+        payloads.append({
             "type": "text",
             "text": header_text,
             "target_chat_id": tech_chat_id,
@@ -751,8 +733,7 @@ async def _copy_ticket_history_to_tech(
         # ========================================
         # 5. Кнопки (sequence_id = last + 3)
         # ========================================
-        await redis_streams.enqueue({
-            "bot_token": bot.token,
+        payloads.append({
             "type": "status_buttons",
             "ticket_id": ticket.id,
             "target_chat_id": tech_chat_id,
@@ -763,6 +744,12 @@ async def _copy_ticket_history_to_tech(
             "attempt": 0
         })
 
+        # Всё одним pipeline; счётчик — только после подтверждения XADD
+        msg_ids = await redis_streams.enqueue_many(payloads)
+
+        # Без разделителя, шапки и кнопок
+        copied_count = len(msg_ids) - 3
+        logger.info("✅ В очередь поставлено %s сообщений истории", copied_count)
         logger.info("📨 Шапка и кнопки отправлены в очередь (в конце)")
 
     except Exception as e:
@@ -791,30 +778,7 @@ async def handle_main_group_message(message: Message, bot: Bot) -> None:
         return
 
     # Системные сообщения - пытаемся удалить
-    if any([
-        message.forum_topic_created,
-        message.forum_topic_closed,
-        message.forum_topic_edited,
-        message.forum_topic_reopened,
-        message.general_forum_topic_hidden,
-        message.general_forum_topic_unhidden,
-        message.new_chat_members,
-        message.left_chat_member,
-        message.new_chat_title,
-        message.new_chat_photo,
-        message.delete_chat_photo,
-        message.group_chat_created,
-        message.supergroup_chat_created,
-        message.channel_chat_created,
-        message.migrate_to_chat_id,
-        message.migrate_from_chat_id,
-        message.pinned_message,
-        message.message_auto_delete_timer_changed,
-        message.video_chat_scheduled,
-        message.video_chat_started,
-        message.video_chat_ended,
-        message.video_chat_participants_invited,
-    ]):
+    if any(get_service_fields(message)):
         logger.info("⭐ Пытаемся удалить системное сообщение в главной группе")
         try:
             await message.delete()
@@ -837,30 +801,7 @@ async def handle_main_group_message(message: Message, bot: Bot) -> None:
             return
 
         # Определяем медиа
-        media_type = None
-        media_file_id = None
-        media_caption = None
-
-        if message.photo:
-            media_type = "photo"
-            media_file_id = message.photo[-1].file_id
-            media_caption = message.caption
-        elif message.video:
-            media_type = "video"
-            media_file_id = message.video.file_id
-            media_caption = message.caption
-        elif message.document:
-            media_type = "document"
-            media_file_id = message.document.file_id
-            media_caption = message.caption
-        elif message.voice:
-            media_type = "voice"
-            media_file_id = message.voice.file_id
-            media_caption = None
-        elif message.audio:
-            media_type = "audio"
-            media_file_id = message.audio.file_id
-            media_caption = message.caption
+        media_type, media_file_id, media_caption = extract_media(message)
 
         message_text = message.text or message.caption or "[медиа]"
         
@@ -876,8 +817,6 @@ async def handle_main_group_message(message: Message, bot: Bot) -> None:
         # 1. Сохраняем в БД
         # ========================================
         try:
-            from app.db.crud.message import TicketMessageCRUD
-
             msg_record = await TicketMessageCRUD.add_message(
                 session=db,
                 ticket_id=ticket.id,
@@ -889,8 +828,6 @@ async def handle_main_group_message(message: Message, bot: Bot) -> None:
                 media_caption=media_caption,
                 telegram_message_id=message.message_id,
             )
-            
-            await db.flush()
             sequence_id = msg_record.id
             logger.debug(f"📝 Сохранено сообщение #{sequence_id}")
 
@@ -920,7 +857,6 @@ async def handle_main_group_message(message: Message, bot: Bot) -> None:
 
             if not tech_thread:
                 try:
-                    from app.db.crud.ticket import get_tech_thread_by_user_and_tech
                     tech_thread = await get_tech_thread_by_user_and_tech(
                         session=db,
                         user_id=ticket.client_tg_id,
@@ -1023,16 +959,11 @@ async def enqueue_ticket_messages_to_tech(
     ticket: Ticket,
     tech_chat_id: int,
     tech_thread_id: int,
-    bot_token: str,
 ):
     """
     Отправляет в Redis Streams ВСЕ сообщения текущего тикета
     (НЕ историю старых тикетов этого клиента).
     """
-    from sqlalchemy import select
-    from app.db.models import TicketMessage
-    from app.utils.redis_streams import redis_streams
-
     stmt = (
         select(TicketMessage)
         .where(TicketMessage.ticket_id == ticket.id)
@@ -1041,10 +972,10 @@ async def enqueue_ticket_messages_to_tech(
     result = await db.execute(stmt)
     messages = result.scalars().all()
 
+    payloads: list[dict] = []
     for msg in messages:
 
         payload = {
-            "bot_token": bot_token,
             "attempt": 0,
             "type": None,
             "target_chat_id": tech_chat_id,
@@ -1057,7 +988,7 @@ async def enqueue_ticket_messages_to_tech(
         if not msg.has_media:
             payload["type"] = "text"
             payload["text"] = msg.message_text or ""
-            await redis_streams.enqueue(payload)
+            payloads.append(payload)
             continue
 
         # -------- MEDIA --------
@@ -1065,7 +996,10 @@ async def enqueue_ticket_messages_to_tech(
         payload["caption"] = msg.media_caption or msg.message_text or ""
 
         payload["type"] = msg.media_type  # photo / video / voice / document
-        await redis_streams.enqueue(payload)
+        payloads.append(payload)
+
+    # Все XADD одним pipeline
+    await redis_streams.enqueue_many(payloads)
 
 
 # ─────────────────────────────────────────────
@@ -1094,8 +1028,8 @@ async def callback_assign_tech(call: CallbackQuery, bot: Bot) -> None:
             stmt = (
                 select(Ticket)
                 .options(
-                    selectinload(Ticket.client),
-                    selectinload(Ticket.assigned_tech),
+                    joinedload(Ticket.client),
+                    joinedload(Ticket.assigned_tech),
                 )
                 .where(Ticket.id == ticket_id)
             )
@@ -1129,7 +1063,7 @@ async def callback_assign_tech(call: CallbackQuery, bot: Bot) -> None:
                 return
 
             # Тег техника
-            tag = _extract_consonants(tech.name)
+            tag = extract_consonants(tech.name)
 
             # Вычисляем итоговое название топика
             tech_title = _build_topic_title(
@@ -1149,6 +1083,9 @@ async def callback_assign_tech(call: CallbackQuery, bot: Bot) -> None:
                     await db.delete(old_thread)
                     logger.info(f"🗑 Удалён старый топик техника {ticket.assigned_tech_id}")
 
+            # Топик, перепривязанный от старого тикета: его маршрут сбросим после commit
+            rebound_location: tuple[int, int] | None = None
+
             # ============================================================
             # 2) Ищем существующий топик у нового техника (по CLIENT_ID!)
             # ============================================================
@@ -1197,7 +1134,7 @@ async def callback_assign_tech(call: CallbackQuery, bot: Bot) -> None:
                     # Копируем историю текущего тикета
                     stmt_messages = (
                         select(Ticket)
-                        .options(selectinload(Ticket.client), selectinload(Ticket.messages))
+                        .options(joinedload(Ticket.client), selectinload(Ticket.messages))
                         .where(Ticket.id == ticket.id)
                     )
                     res = await db.execute(stmt_messages)
@@ -1227,13 +1164,23 @@ async def callback_assign_tech(call: CallbackQuery, bot: Bot) -> None:
                     )
 
                     await cache.invalidate_ticket_threads(existing_thread.ticket_id)
+                    # Маршрут сбрасываем после commit: до него сообщение техника
+                    # прочитало бы из БД старый ticket_id и снова закешировало его
+                    rebound_location = (
+                        existing_thread.tech_chat_id,
+                        existing_thread.tech_thread_id,
+                    )
+                    await cache.clear_feedback_sent_in_topic(
+                        existing_thread.tech_chat_id,
+                        existing_thread.tech_thread_id,
+                    )
                     existing_thread.ticket_id = ticket.id
 
                     # Копируем историю нового тикета
                     stmt_with_messages = (
                         select(Ticket)
                         .options(
-                            selectinload(Ticket.client),
+                            joinedload(Ticket.client),
                             selectinload(Ticket.messages),
                         )
                         .where(Ticket.id == ticket.id)
@@ -1294,7 +1241,7 @@ async def callback_assign_tech(call: CallbackQuery, bot: Bot) -> None:
                 stmt_messages = (
                     select(Ticket)
                     .options(
-                        selectinload(Ticket.client),
+                        joinedload(Ticket.client),
                         selectinload(Ticket.messages),
                     )
                     .where(Ticket.id == ticket.id)
@@ -1318,6 +1265,9 @@ async def callback_assign_tech(call: CallbackQuery, bot: Bot) -> None:
             ticket.assigned_tech_id = tech.id
             await db.commit()
 
+            if rebound_location is not None:
+                await cache.invalidate_tech_route(*rebound_location)
+
             # ============================================================
             # 5) Обновляем названия главных/тех-топиков
             # ============================================================
@@ -1396,8 +1346,8 @@ async def callback_change_status(call: CallbackQuery, bot: Bot) -> None:
             stmt = (
                 select(Ticket)
                 .options(
-                    selectinload(Ticket.client),
-                    selectinload(Ticket.assigned_tech)
+                    joinedload(Ticket.client),
+                    joinedload(Ticket.assigned_tech)
                 )
                 .where(Ticket.id == ticket_id)
             )
@@ -1440,11 +1390,7 @@ async def callback_change_status(call: CallbackQuery, bot: Bot) -> None:
 
                 await _update_all_topic_titles(bot, ticket, db)
 
-                emoji = {
-                    TicketStatus.NEW: "🟢",
-                    TicketStatus.WORK: "🟡",
-                    TicketStatus.CLOSED: "⚪️",
-                }[new_status]
+                emoji = status_emoji(new_status)
 
                 await call.answer(f"{emoji} Статус уже установлен\n🔄 Топики обновлены", show_alert=True)
                 return
@@ -1516,11 +1462,7 @@ async def callback_change_status(call: CallbackQuery, bot: Bot) -> None:
                     except Exception:
                         pass
 
-            emoji = {
-                TicketStatus.NEW: "🟢",
-                TicketStatus.WORK: "🟡",
-                TicketStatus.CLOSED: "⚪️",
-            }[new_status]
+            emoji = status_emoji(new_status)
             await call.answer(f"{emoji} Статус изменён", show_alert=True)
         except Exception as e:
             logger.error(f"❌ Ошибка callback_change_status:", exc_info=True)
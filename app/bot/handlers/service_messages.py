@@ -16,6 +16,23 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Типичные фразы об изменении/закреплении (ищутся в тексте в нижнем регистре).
+# Женские формы ("изменила", ...) покрываются мужскими как подстроки.
+_SERVICE_PHRASES: tuple[str, ...] = (
+    "changed the",
+    "изменил",
+    "renamed",
+    "переименовал",
+    "pinned",
+    "закрепил",
+)
+
+
+def _has_service_phrase(text: str) -> bool:
+    """Есть ли в тексте служебная фраза (текст приводится к нижнему регистру один раз)."""
+    lowered = text.lower()
+    return any(phrase in lowered for phrase in _SERVICE_PHRASES)
+
 
 async def _safe_delete_message(
     bot: Bot,
@@ -102,17 +119,7 @@ async def handle_service_messages(message: Message, bot: Bot) -> None:
         reason = f"service_type_{message.service_type}"
 
     # 4. Проверка текста на типичные фразы (от бота тоже!)
-    elif message.text and any([
-        "changed the" in message.text.lower(),
-        "изменил" in message.text.lower(),
-        "изменила" in message.text.lower(),
-        "renamed" in message.text.lower(),
-        "переименовал" in message.text.lower(),
-        "переименовала" in message.text.lower(),
-        "pinned" in message.text.lower(),
-        "закрепил" in message.text.lower(),
-        "закрепила" in message.text.lower(),
-    ]):
+    elif message.text and _has_service_phrase(message.text):
         should_delete = True
         reason = "topic_rename_text"
 
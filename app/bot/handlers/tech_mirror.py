@@ -10,27 +10,151 @@ from aiogram.exceptions import (
     TelegramBadRequest,
 )
 from aiogram.filters import Command
-from aiogram.types import Message, InlineQuery, InlineQueryResultArticle, InputTextMessageContent, CallbackQuery
-from sqlalchemy import select
+from aiogram.types import Message, InlineQuery, InlineQueryResultArticle, InputTextMessageContent, CallbackQuery, User
+from sqlalchemy import bindparam, event, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from aiogram.exceptions import TelegramBadRequest
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, raiseload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.bot.handlers.main_group import _update_all_topic_titles
+from app.bot.handlers.user_poll import start_feedback_poll
 
 from app.config import settings
 from app.db.database import db_manager
 from app.db.models import TechThread, Ticket, TicketStatus
+from app.db.crud.message import TicketMessageCRUD
 from app.db.crud.user import get_or_create_user
+from app.utils.background import run_in_background
+from app.utils.cache import cache
 from app.utils.redis_streams import redis_streams
+from app.utils.telegram import extract_media, get_service_fields
+from app.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Поиск TechThread выполняется на каждое сообщение из тех-группы: запрос
+# собираем один раз, чтобы SQL-текст был неизменным и asyncpg переиспользовал
+# подготовленный statement из своего кеша. Параметры — через bindparam, поэтому
+# скомпилированная форма берётся из compiled cache SQLAlchemy; lambda_stmt здесь
+# не нужен — он лишь добавил бы разбор замыкания на каждый вызов.
+# Тикет, клиент и техник приходят тем же запросом (JOIN); остальные связи
+# (messages, tech_threads, user.tickets, ...) хендлерам не нужны — raiseload,
+# чтобы они не тянулись selectin-запросами по умолчанию.
+_THREAD_AND_TICKET_BY_LOCATION = (
+    select(TechThread)
+    .options(
+        joinedload(TechThread.ticket).options(
+            joinedload(Ticket.client).raiseload("*"),
+            joinedload(Ticket.assigned_tech).raiseload("*"),
+            raiseload("*"),
+        ),
+        raiseload("*"),
+    )
+    .where(
+        TechThread.tech_chat_id == bindparam("tech_chat_id"),
+        TechThread.tech_thread_id == bindparam("tech_thread_id"),
+    )
+)
+
+# Фильтры регистрации: сообщение в топике группы и зеркалируемый контент
+_GROUP_TOPIC = F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}) & F.message_thread_id
+_MIRRORED_CONTENT = F.text | F.photo | F.video | F.document | F.voice | F.audio
+
+# Отправители, недавно сверенные с таблицей users: (tg_id, username, имя, фамилия)
+_seen_users: TTLCache[tuple, bool] = TTLCache(maxsize=10000, ttl=600)
+
+# Известные (tech_chat_id, tech_thread_id) тех-топиков — чтобы отсекать
+# сообщения из «чужих» топиков, не открывая сессию БД.
+# Это надмножество: записи только добавляются, а удалённый или перенесённый
+# топик просто проходит проверку и не находится в БД, как и раньше.
+# Множество пополняют загрузка при старте и ORM-события; топики, созданные
+# Core-вставкой или другим процессом, находятся запросом к БД на промахе.
+_known_tech_locations: set[tuple[int, int]] = set()
+
+# Топики, которые на промахе проверили по БД и не нашли: повторные сообщения
+# из них отсекаются без запроса, пока запись жива
+_unknown_tech_locations: TTLCache[tuple[int, int], bool] = TTLCache(maxsize=10000, ttl=60)
+
 
 # ─────────────────────────────────────────────
 #  Вспомогательные функции
 # ─────────────────────────────────────────────
 
+@event.listens_for(TechThread, "after_insert")
+@event.listens_for(TechThread, "after_update")
+def _remember_tech_location(mapper, connection, target: TechThread) -> None:
+    """Добавить местоположение созданного/изменённого TechThread в кеш."""
+    location = (target.tech_chat_id, target.tech_thread_id)
+    _known_tech_locations.add(location)
+    _unknown_tech_locations.pop(location)
+
+
+async def load_known_tech_locations() -> None:
+    """Загрузить местоположения всех тех-топиков (вызывается при старте бота)."""
+    async with db_manager.session() as db:
+        res = await db.execute(
+            select(TechThread.tech_chat_id, TechThread.tech_thread_id)
+        )
+        _known_tech_locations.update(res.tuples().all())
+
+    logger.info("📍 Загружено %s тех-топиков для зеркалирования", len(_known_tech_locations))
+
+
+async def _is_known_tech_location(tech_chat_id: int, tech_thread_id: int) -> bool:
+    """
+    Связан ли топик с каким-либо TechThread.
+
+    Промах по _known_tech_locations не значит «чужой топик»: запись могла
+    появиться в обход ORM-событий. Поэтому на промахе проверяем БД и кешируем
+    результат в одну из двух сторон.
+    """
+    location = (tech_chat_id, tech_thread_id)
+    if location in _known_tech_locations:
+        return True
+    if location in _unknown_tech_locations:
+        return False
+
+    async with db_manager.session() as db:
+        found = await db.scalar(
+            select(TechThread.id)
+            .where(
+                TechThread.tech_chat_id == tech_chat_id,
+                TechThread.tech_thread_id == tech_thread_id,
+            )
+            .limit(1)
+        )
+
+    if found is None:
+        _unknown_tech_locations.set(location, True)
+        return False
+
+    _known_tech_locations.add(location)
+    return True
+
+
+async def _ensure_user(db: AsyncSession, tg_user: User) -> None:
+    """
+    Убедиться, что отправитель есть в users.
+
+    get_or_create_user идемпотентен, поэтому отправителя с теми же
+    username/именем повторно не сверяем, пока запись в _seen_users жива
+    (last_seen при этом обновляется не чаще раза в 10 минут).
+    """
+    key = (tg_user.id, tg_user.username, tg_user.first_name, tg_user.last_name)
+    if key in _seen_users:
+        return
+
+    await get_or_create_user(
+        db=db,
+        telegram_id=tg_user.id,
+        username=tg_user.username,
+        first_name=tg_user.first_name,
+        last_name=tg_user.last_name,
+    )
+    _seen_users.set(key, True)
+
+
 async def _copy_message_direct(
     bot: Bot,
     source_message: Message,
@@ -114,7 +238,7 @@ async def _copy_message_direct(
         return True
 
     except TelegramRetryAfter as e:
-        logger.warning(f"⏳ 429: ждём {e.retry_after}s")
+        logger.warning("⏳ 429: ждём %ss", e.retry_after)
         await asyncio.sleep(e.retry_after)
         
         # Повторная попытка
@@ -136,15 +260,15 @@ async def _copy_message_direct(
                 await bot.send_message(chat_id=target_chat_id, text=text, parse_mode="HTML", disable_web_page_preview=True, **kwargs)
             return True
         except Exception as retry_error:
-            logger.error(f"❌ Повторная отправка провалилась: {retry_error}")
+            logger.error("❌ Повторная отправка провалилась: %s", retry_error)
             return False
 
     except TelegramBadRequest as e:
-        logger.error(f"❌ BadRequest при копировании: {e}")
+        logger.error("❌ BadRequest при копировании: %s", e)
         return False
 
     except Exception as e:
-        logger.error(f"❌ Ошибка копирования: {e}", exc_info=True)
+        logger.error("❌ Ошибка копирования: %s", e, exc_info=True)
         return False
     
 
@@ -165,56 +289,105 @@ async def _pin_message_in_topic(
             message_id=message_id,
             disable_notification=True,
         )
-        logger.info(f"📌 Закреплено сообщение {message_id} в чате {chat_id}")
+        logger.info("📌 Закреплено сообщение %s в чате %s", message_id, chat_id)
         return True
     except TelegramBadRequest as e:
-        logger.warning(f"⚠️ Не удалось закрепить сообщение: {e}")
+        logger.warning("⚠️ Не удалось закрепить сообщение: %s", e)
         return False
     except Exception as e:
-        logger.error(f"❌ Ошибка закрепления сообщения: {e}")
+        logger.error("❌ Ошибка закрепления сообщения: %s", e)
         return False
 
 
-def _status_emoji(status: TicketStatus) -> str:
-    """Получить эмодзи статуса."""
-    return {
-        TicketStatus.NEW: "🟢",
-        TicketStatus.WORK: "🟡",
-        TicketStatus.CLOSED: "⚪️",
-    }.get(status, "⚪️")
+async def _send_and_pin(
+    bot: Bot,
+    chat_id: int,
+    thread_id: int | None,
+    text: str,
+) -> Message:
+    """Отправить заметку в топик и закрепить её."""
+    sent = await bot.send_message(
+        chat_id=chat_id,
+        message_thread_id=thread_id,
+        text=text,
+        parse_mode="HTML"
+    )
+    await _pin_message_in_topic(
+        bot=bot,
+        chat_id=chat_id,
+        message_id=sent.message_id,
+    )
+    return sent
 
 
-async def _get_tech_thread_by_location(
+async def _get_thread_and_ticket(
     session: AsyncSession,
     tech_chat_id: int,
     tech_thread_id: int
-) -> TechThread | None:
-    """Получить TechThread по местоположению в группе техника."""
-    stmt = (
-        select(TechThread)
-        .where(
-            TechThread.tech_chat_id == tech_chat_id,
-            TechThread.tech_thread_id == tech_thread_id
-        )
+) -> tuple[TechThread | None, Ticket | None]:
+    """
+    Получить TechThread по местоположению в группе техника
+    вместе с тикетом, клиентом и назначенным техником — одним запросом.
+    """
+    res = await session.execute(
+        _THREAD_AND_TICKET_BY_LOCATION,
+        {"tech_chat_id": tech_chat_id, "tech_thread_id": tech_thread_id},
     )
-    res = await session.execute(stmt)
-    return res.scalar_one_or_none()
+    tech_thread = res.unique().scalar_one_or_none()
+    if not tech_thread:
+        return None, None
+    return tech_thread, tech_thread.ticket
 
 
-async def _get_ticket_with_client(
+async def _get_tech_route(
     session: AsyncSession,
-    ticket_id: int
-) -> Ticket | None:
-    """Получить тикет с предзагрузкой клиента."""
-    from sqlalchemy.orm import selectinload
-
-    stmt = (
-        select(Ticket)
-        .options(selectinload(Ticket.client))
-        .where(Ticket.id == ticket_id)
-    )
-    res = await session.execute(stmt)
-    return res.scalar_one_or_none()
+    tech_chat_id: int,
+    tech_thread_id: int
+) -> dict | None:
+    """
+    Куда зеркалировать сообщение из топика техника.
+
+    Сначала смотрим в кеш; на промахе читаем TechThread + Ticket одним
+    запросом и кешируем маршрут. None — если топик не связан с тикетом
+    или у тикета нет клиента.
+
+    Returns:
+        {"ticket_id", "main_chat_id", "main_thread_id", "client_tg_id"}
+    """
+    route = await cache.get_tech_route(tech_chat_id, tech_thread_id)
+    if route:
+        return route
+
+    tech_thread, ticket = await _get_thread_and_ticket(session, tech_chat_id, tech_thread_id)
+
+    if not tech_thread:
+        logger.debug(
+            "TechThread не найден для группы %s, топик %s",
+            tech_chat_id,
+            tech_thread_id,
+        )
+        return None
+
+    if not ticket:
+        logger.warning(
+            "⚠️ Тикет #%s не найден для TechThread", tech_thread.ticket_id
+        )
+        return None
+
+    if not ticket.client:
+        logger.error(
+            "❌ У тикета #%s нет связанного клиента", ticket.id
+        )
+        return None
+
+    route = {
+        "ticket_id": ticket.id,
+        "main_chat_id": ticket.main_chat_id,
+        "main_thread_id": ticket.main_thread_id,
+        "client_tg_id": ticket.client_tg_id,
+    }
+    await cache.set_tech_route(tech_chat_id, tech_thread_id, route)
+    return route
 
 
 async def _send_feedback_poll(bot: Bot, ticket_id: int, client_tg_id: int, tech_id: int | None = None) -> None:
@@ -228,8 +401,6 @@ async def _send_feedback_poll(bot: Bot, ticket_id: int, client_tg_id: int, tech_
         tech_id: ID техника (может быть None)
     """
     try:
-        from app.bot.handlers.user_poll import start_feedback_poll
-
         await start_feedback_poll(
             bot=bot,
             user_id=client_tg_id,
@@ -237,30 +408,57 @@ async def _send_feedback_poll(bot: Bot, ticket_id: int, client_tg_id: int, tech_
             tech_id=tech_id
         )
 
-        logger.info(f"✅ Опрос инициирован для клиента {client_tg_id}, тикет #{ticket_id}")
+        logger.info("✅ Опрос инициирован для клиента %s, тикет #%s", client_tg_id, ticket_id)
+    except Exception as e:
+        logger.error("❌ Не удалось инициировать опрос: %s", e)
+
+
+async def _update_topic_titles_background(bot: Bot, ticket: Ticket) -> None:
+    """
+    Обновить названия топиков тикета в фоне.
+
+    Тикет уже загружен вместе с client и assigned_tech (expire_on_commit=False),
+    поэтому повторно его не читаем. Сессию открываем собственную: сессия хендлера
+    к моменту выполнения задачи уже закрыта.
+    """
+    try:
+        async with db_manager.session() as db:
+            await _update_all_topic_titles(bot, ticket, db)
     except Exception as e:
-        logger.error(f"❌ Не удалось инициировать опрос: {e}")
+        logger.error("❌ Ошибка фонового обновления топиков тикета #%s: %s", ticket.id, e)
 
 
 async def send_feedback_button_handler(call: CallbackQuery, bot: Bot) -> None:
     """Обработка нажатия кнопки 'Отправить опрос'."""
-    logger.info(f"🔧 send_feedback_button_handler: data={call.data}, user={call.from_user.id}")
+    logger.info(
+        "🔧 send_feedback_button_handler: data=%s, user=%s",
+        call.data,
+        call.from_user.id,
+    )
     
     # Парсим ticket_id из callback_data
     try:
         _, ticket_id_str = call.data.split(":", maxsplit=1)
         ticket_id = int(ticket_id_str)
     except (ValueError, IndexError) as e:
-        logger.error(f"❌ Ошибка парсинга callback_data: {e}")
+        logger.error("❌ Ошибка парсинга callback_data: %s", e)
         await call.answer("❌ Некорректные данные", show_alert=True)
         return
 
+    # Проверка на повторную отправку опроса — ticket_id уже известен, в БД не ходим
+    if await cache.is_feedback_sent(ticket_id):
+        await call.answer(
+            "ℹ️ Опрос уже был отправлен ранее.",
+            show_alert=True
+        )
+        return
+
     async with db_manager.session() as db:
         try:
             # Получаем тикет с клиентом
             stmt = (
                 select(Ticket)
-                .options(selectinload(Ticket.client))
+                .options(joinedload(Ticket.client))
                 .where(Ticket.id == ticket_id)
             )
             result = await db.execute(stmt)
@@ -282,18 +480,6 @@ async def send_feedback_button_handler(call: CallbackQuery, bot: Bot) -> None:
                 )
                 return
 
-            # Проверка на повторную отправку опроса
-            feedback_key = f"feedback_sent:{ticket.id}"
-            from app.utils.cache import cache
-
-            already = await cache.get(feedback_key)
-            if already:
-                await call.answer(
-                    "ℹ️ Опрос уже был отправлен ранее.",
-                    show_alert=True
-                )
-                return
-
             # Отправляем опрос
             await _send_feedback_poll(
                 bot=bot,
@@ -303,7 +489,11 @@ async def send_feedback_button_handler(call: CallbackQuery, bot: Bot) -> None:
             )
 
             # Запоминаем факт отправки (TTL = 7 дней)
-            await cache.set(feedback_key, True, expire=7*24*3600)
+            await cache.mark_feedback_sent(
+                ticket.id,
+                call.message.chat.id if call.message else None,
+                call.message.message_thread_id if call.message else None,
+            )
 
             await call.answer("✅ Опрос отправлен клиенту")
             
@@ -317,7 +507,7 @@ async def send_feedback_button_handler(call: CallbackQuery, bot: Bot) -> None:
                 pass
 
         except Exception as e:
-            logger.error(f"❌ Ошибка отправки опроса: {e}", exc_info=True)
+            logger.error("❌ Ошибка отправки опроса: %s", e, exc_info=True)
             await call.answer(
                 "❌ Ошибка при отправке опроса.",
                 show_alert=True
@@ -334,117 +524,43 @@ async def handle_tech_group_message(message: Message, bot: Bot) -> None:
         return
 
     # Игнорируем и удаляем служебные
-    if any([
-        message.forum_topic_created,
-        message.forum_topic_closed,
-        message.forum_topic_edited,
-        message.forum_topic_reopened,
-        message.general_forum_topic_hidden,
-        message.general_forum_topic_unhidden,
-        message.new_chat_members,
-        message.left_chat_member,
-        message.new_chat_title,
-        message.new_chat_photo,
-        message.delete_chat_photo,
-        message.group_chat_created,
-        message.supergroup_chat_created,
-        message.channel_chat_created,
-        message.migrate_to_chat_id,
-        message.migrate_from_chat_id,
-        message.pinned_message,
-        message.message_auto_delete_timer_changed,
-        message.video_chat_scheduled,
-        message.video_chat_started,
-        message.video_chat_ended,
-        message.video_chat_participants_invited,
-    ]):
+    if any(get_service_fields(message)):
         try:
             await message.delete()
         except Exception:
             pass
         return
 
-    # Проверяем команды
+    # Топик не связан ни с одним тикетом — дальше не идём
+    if not await _is_known_tech_location(message.chat.id, message.message_thread_id):
+        return
+
+    # Команды не зеркалируем: известные обрабатываются своими хендлерами,
+    # остальные просто игнорируются
     if message.text and message.text.startswith("/"):
-        if message.text.lower().startswith((
-            "/s", "/i", "/feed", "/f",
-            "/work", "/done", "/staff", "/l", "/lead", "/internal"
-        )):
-            return
         return
 
+    # Соединение из пула сессия берёт только на первом запросе: при попадании
+    # в кеш маршрута TechThread и Ticket не читаются вовсе
     async with db_manager.session() as db:
-        tech_thread = await _get_tech_thread_by_location(
-            db,
-            message.chat.id,
-            message.message_thread_id
-        )
-
-        if not tech_thread:
-            logger.debug(
-                f"TechThread не найден для группы {message.chat.id}, "
-                f"топик {message.message_thread_id}"
-            )
-            return
-
-        ticket = await _get_ticket_with_client(db, tech_thread.ticket_id)
-
-        if not ticket:
-            logger.warning(
-                f"⚠️ Тикет #{tech_thread.ticket_id} не найден для TechThread"
-            )
-            return
-
-        if not ticket.client:
-            logger.error(
-                f"❌ У тикета #{ticket.id} нет связанного клиента"
-            )
+        route = await _get_tech_route(db, message.chat.id, message.message_thread_id)
+        if not route:
             return
 
         # Определяем медиа
-        media_type = None
-        media_file_id = None
-        media_caption = None
-
-        if message.photo:
-            media_type = "photo"
-            media_file_id = message.photo[-1].file_id
-            media_caption = message.caption
-        elif message.video:
-            media_type = "video"
-            media_file_id = message.video.file_id
-            media_caption = message.caption
-        elif message.document:
-            media_type = "document"
-            media_file_id = message.document.file_id
-            media_caption = message.caption
-        elif message.voice:
-            media_type = "voice"
-            media_file_id = message.voice.file_id
-        elif message.audio:
-            media_type = "audio"
-            media_file_id = message.audio.file_id
-            media_caption = message.caption
+        media_type, media_file_id, media_caption = extract_media(message)
 
         message_text = message.text or message.caption or "[медиа]"
 
-        await get_or_create_user(
-            db=db,
-            telegram_id=message.from_user.id,
-            username=message.from_user.username,
-            first_name=message.from_user.first_name,
-            last_name=message.from_user.last_name,
-        )
+        await _ensure_user(db, message.from_user)
 
         # ========================================
         # 1. Сохраняем в БД
         # ========================================
         try:
-            from app.db.crud.message import TicketMessageCRUD
-
             msg_record = await TicketMessageCRUD.add_message(
                 session=db,
-                ticket_id=ticket.id,
+                ticket_id=route["ticket_id"],
                 user_id=message.from_user.id,
                 message_text=message_text,
                 is_from_admin=True,
@@ -453,51 +569,56 @@ async def handle_tech_group_message(message: Message, bot: Bot) -> None:
                 media_caption=media_caption,
                 telegram_message_id=message.message_id,
             )
-            
-            await db.flush()
             sequence_id = msg_record.id
-            logger.debug(f"📝 Сохранено сообщение техника #{sequence_id}")
+            logger.debug("📝 Сохранено сообщение техника #%s", sequence_id)
 
         except Exception as e:
-            logger.error(f"❌ Не удалось сохранить в БД: {e}")
+            logger.error("❌ Не удалось сохранить в БД: %s", e)
             return
 
         # ========================================
-        # 2. ПРЯМОЕ копирование в главную группу
+        # 2. ПРЯМОЕ копирование в главную группу и клиенту
         # ========================================
-        success = await _copy_message_direct(
-            bot=bot,
-            source_message=message,
-            target_chat_id=ticket.main_chat_id,
-            target_thread_id=ticket.main_thread_id,
+        # Копии независимы друг от друга и от сессии БД — отправляем параллельно
+        main_result, client_result = await asyncio.gather(
+            _copy_message_direct(
+                bot=bot,
+                source_message=message,
+                target_chat_id=route["main_chat_id"],
+                target_thread_id=route["main_thread_id"],
+            ),
+            _copy_message_direct(
+                bot=bot,
+                source_message=message,
+                target_chat_id=route["client_tg_id"],
+            ),
+            return_exceptions=True,
         )
-        
-        if success:
+
+        if main_result is True:
             logger.info(
-                f"✅ Сообщение техника #{sequence_id} скопировано в главную группу "
-                f"(топик {ticket.main_thread_id})"
+                "✅ Сообщение техника #%s скопировано в главную группу (топик %s)",
+                sequence_id,
+                route["main_thread_id"],
             )
         else:
             logger.error(
-                f"❌ Не удалось скопировать сообщение техника #{sequence_id} в главную группу"
+                "❌ Не удалось скопировать сообщение техника #%s в главную группу: %s",
+                sequence_id,
+                main_result if isinstance(main_result, BaseException) else "см. выше",
             )
 
-        # ========================================
-        # 3. ПРЯМОЕ копирование клиенту
-        # ========================================
-        success = await _copy_message_direct(
-            bot=bot,
-            source_message=message,
-            target_chat_id=ticket.client_tg_id,
-        )
-        
-        if success:
+        if client_result is True:
             logger.info(
-                f"✅ Сообщение техника #{sequence_id} скопировано клиенту {ticket.client_tg_id}"
+                "✅ Сообщение техника #%s скопировано клиенту %s",
+                sequence_id,
+                route["client_tg_id"],
             )
         else:
             logger.error(
-                f"❌ Не удалось скопировать сообщение техника #{sequence_id} клиенту"
+                "❌ Не удалось скопировать сообщение техника #%s клиенту: %s",
+                sequence_id,
+                client_result if isinstance(client_result, BaseException) else "см. выше",
             )
 
 
@@ -539,7 +660,7 @@ async def cmd_staff(message: Message, bot: Bot) -> None:
 
     async with db_manager.session() as db:
         # Находим TechThread по текущему тех-топику
-        tech_thread = await _get_tech_thread_by_location(
+        tech_thread, ticket = await _get_thread_and_ticket(
             db,
             message.chat.id,
             message.message_thread_id
@@ -549,8 +670,6 @@ async def cmd_staff(message: Message, bot: Bot) -> None:
             await message.reply("❌ Топик не связан с тикетом")
             return
 
-        ticket = await _get_ticket_with_client(db, tech_thread.ticket_id)
-
         if not ticket:
             await message.reply("❌ Тикет не найден")
             return
@@ -565,51 +684,25 @@ async def cmd_staff(message: Message, bot: Bot) -> None:
         formatted_text = f"💼 <b>{sender_name}:</b> {staff_text}"
 
         # Убедимся, что техник есть в users
-        from app.db.crud.user import get_or_create_user  # уже есть в модуле, но на всякий
-        await get_or_create_user(
-            db=db,
-            telegram_id=message.from_user.id,
-            username=message.from_user.username,
-            first_name=message.from_user.first_name,
-            last_name=message.from_user.last_name,
+        await _ensure_user(db, message.from_user)
+
+        # 1) Отправляем заметку в ТЕКУЩИЙ тех-топик и в ГЛАВНУЮ группу (топик тикета).
+        #    Места назначения независимы — работаем с ними параллельно;
+        #    внутри каждого сначала отправка, потом закрепление.
+        tech_result, main_result = await asyncio.gather(
+            _send_and_pin(bot, message.chat.id, message.message_thread_id, formatted_text),
+            _send_and_pin(bot, ticket.main_chat_id, ticket.main_thread_id, formatted_text),
+            return_exceptions=True,
         )
 
-        # 1) Отправляем заметку в ТЕКУЩИЙ тех-топик и закрепляем
-        try:
-            tech_msg = await bot.send_message(
-                chat_id=message.chat.id,
-                message_thread_id=message.message_thread_id,
-                text=formatted_text,
-                parse_mode="HTML"
-            )
-            await _pin_message_in_topic(
-                bot=bot,
-                chat_id=message.chat.id,
-                message_id=tech_msg.message_id,
-            )
-        except Exception as e:
-            logger.error(f"❌ Ошибка отправки заметки в тех-группу: {e}")
+        if isinstance(tech_result, Exception):
+            logger.error("❌ Ошибка отправки заметки в тех-группу: %s", tech_result)
 
-        # 2) Отправляем заметку в ГЛАВНУЮ группу (топик тикета) и закрепляем
-        try:
-            main_msg = await bot.send_message(
-                chat_id=ticket.main_chat_id,
-                message_thread_id=ticket.main_thread_id,
-                text=formatted_text,
-                parse_mode="HTML"
-            )
-            await _pin_message_in_topic(
-                bot=bot,
-                chat_id=ticket.main_chat_id,
-                message_id=main_msg.message_id,
-            )
-        except Exception as e:
-            logger.error(f"❌ Ошибка отправки заметки в главную группу: {e}")
+        if isinstance(main_result, Exception):
+            logger.error("❌ Ошибка отправки заметки в главную группу: %s", main_result)
 
         # 3) Логируем заметку в историю тикета, чтобы можно было восстановить
         try:
-            from app.db.crud.message import TicketMessageCRUD  # :contentReference[oaicite:0]{index=0}
-
             await TicketMessageCRUD.add_message(
                 session=db,
                 ticket_id=ticket.id,
@@ -619,7 +712,7 @@ async def cmd_staff(message: Message, bot: Bot) -> None:
                 telegram_message_id=None,  # можно не привязывать
             )
         except Exception as e:
-            logger.error(f"❌ Не удалось сохранить служебную заметку в БД: {e}")
+            logger.error("❌ Не удалось сохранить служебную заметку в БД: %s", e)
 
         await db.commit()
 
@@ -638,17 +731,22 @@ async def cmd_feedback(message: Message, bot: Bot) -> None:
     """
 
     # 1. Команда возможна только в топике
+    #    (сам текст команды уже проверен фильтром Command("feed", "f"))
     if not message.message_thread_id:
         return
 
-    # 2. Проверяем, что текст — команда
-    if not message.text or not message.text.lower().startswith(("/feed", "/f")):
+    # 2. Опрос по тикету этого топика уже отправлялся — отвечаем без БД
+    if await cache.is_feedback_sent_in_topic(message.chat.id, message.message_thread_id):
+        await message.reply(
+            "ℹ️ Опрос уже был отправлен ранее.",
+            parse_mode="HTML"
+        )
         return
 
     async with db_manager.session() as db:
 
-        # 3. Ищем тех-топик
-        tech_thread = await _get_tech_thread_by_location(
+        # 3. Ищем тех-топик вместе с тикетом и клиентом
+        tech_thread, ticket = await _get_thread_and_ticket(
             db,
             message.chat.id,
             message.message_thread_id
@@ -658,9 +756,6 @@ async def cmd_feedback(message: Message, bot: Bot) -> None:
             await message.reply("❌ Этот топик не связан с тикетом")
             return
 
-        # 4. Получаем тикет с клиентом
-        ticket = await _get_ticket_with_client(db, tech_thread.ticket_id)
-
         if not ticket:
             await message.reply("❌ Тикет не найден", parse_mode="HTML")
             return
@@ -669,7 +764,7 @@ async def cmd_feedback(message: Message, bot: Bot) -> None:
             await message.reply("❌ У тикета нет клиента", parse_mode="HTML")
             return
 
-        # 5. Проверка: тикет должен быть закрыт
+        # 4. Проверка: тикет должен быть закрыт
         if ticket.status != TicketStatus.CLOSED:
             await message.reply(
                 "⚠️ Опрос можно отправить только для <b>закрытого</b> тикета.",
@@ -677,20 +772,16 @@ async def cmd_feedback(message: Message, bot: Bot) -> None:
             )
             return
 
-        # 6. Проверка на повторную отправку опроса
-        #    Чтобы не спамить клиенту
-        feedback_key = f"feedback_sent:{ticket.id}"
-        from app.utils.cache import cache
-
-        already = await cache.get(feedback_key)
-        if already:
+        # 5. Проверка на повторную отправку опроса по тикету
+        #    (мог быть отправлен кнопкой или из другого топика)
+        if await cache.is_feedback_sent(ticket.id):
             await message.reply(
                 "ℹ️ Опрос уже был отправлен ранее.",
                 parse_mode="HTML"
             )
             return
 
-        # 7. Отправляем опрос
+        # 6. Отправляем опрос
         try:
             await _send_feedback_poll(
                 bot=bot,
@@ -700,12 +791,16 @@ async def cmd_feedback(message: Message, bot: Bot) -> None:
             )
 
             # Запоминаем факт отправки (TTL = 7 дней)
-            await cache.set(feedback_key, True, ttl=7*24*3600)
+            await cache.mark_feedback_sent(
+                ticket.id,
+                message.chat.id,
+                message.message_thread_id,
+            )
 
             await message.reply("📨 Опрос отправлен клиенту.", parse_mode="HTML")
 
         except Exception as e:
-            logger.error(f"❌ Ошибка отправки опроса вручную: {e}")
+            logger.error("❌ Ошибка отправки опроса вручную: %s", e)
             await message.reply(
                 "❌ Ошибка при отправке опроса.",
                 parse_mode="HTML"
@@ -747,7 +842,7 @@ async def cmd_internal(message: Message, bot: Bot) -> None:
         return
 
     async with db_manager.session() as db:
-        tech_thread = await _get_tech_thread_by_location(
+        tech_thread, ticket = await _get_thread_and_ticket(
             db,
             message.chat.id,
             message.message_thread_id
@@ -757,8 +852,6 @@ async def cmd_internal(message: Message, bot: Bot) -> None:
             await message.reply("❌ Топик не связан с тикетом")
             return
 
-        ticket = await _get_ticket_with_client(db, tech_thread.ticket_id)
-
         if not ticket:
             await message.reply("❌ Тикет не найден")
             return
@@ -774,36 +867,16 @@ async def cmd_internal(message: Message, bot: Bot) -> None:
         formatted_text = f"📝 <b>Внутренняя заметка ({sender_name}):</b> {internal_text}"
 
         # Убедимся, что техник есть в users
-        from app.db.crud.user import get_or_create_user
-        await get_or_create_user(
-            db=db,
-            telegram_id=message.from_user.id,
-            username=message.from_user.username,
-            first_name=message.from_user.first_name,
-            last_name=message.from_user.last_name,
-        )
+        await _ensure_user(db, message.from_user)
 
-        # 1) Отправляем заметку в ТЕКУЩИЙ тех-топик
+        # 1) Отправляем заметку в ТЕКУЩИЙ тех-топик и 2) закрепляем её
         try:
-            internal_msg = await bot.send_message(
-                chat_id=message.chat.id,
-                message_thread_id=message.message_thread_id,
-                text=formatted_text,
-                parse_mode="HTML"
-            )
-            # 2) Закрепляем её
-            await _pin_message_in_topic(
-                bot=bot,
-                chat_id=message.chat.id,
-                message_id=internal_msg.message_id,
-            )
+            await _send_and_pin(bot, message.chat.id, message.message_thread_id, formatted_text)
         except Exception as e:
-            logger.error(f"❌ Ошибка отправки внутренней заметки: {e}")
+            logger.error("❌ Ошибка отправки внутренней заметки: %s", e)
 
         # 3) Сохраняем как сообщение тикета (но оно нигде, кроме тех-групп, не показывается)
         try:
-            from app.db.crud.message import TicketMessageCRUD
-
             await TicketMessageCRUD.add_message(
                 session=db,
                 ticket_id=ticket.id,
@@ -813,7 +886,7 @@ async def cmd_internal(message: Message, bot: Bot) -> None:
                 telegram_message_id=None,
             )
         except Exception as e:
-            logger.error(f"❌ Не удалось сохранить внутреннюю заметку в БД: {e}")
+            logger.error("❌ Не удалось сохранить внутреннюю заметку в БД: %s", e)
 
         await db.commit()
 
@@ -824,6 +897,24 @@ async def cmd_internal(message: Message, bot: Bot) -> None:
 #  Команды изменения статуса
 # ─────────────────────────────────────────────
 
+async def _set_ticket_status(db: AsyncSession, ticket: Ticket, status: TicketStatus) -> None:
+    """
+    Сменить статус тикета одним UPDATE по первичному ключу и закоммитить.
+
+    Объект в памяти обновляется без пометки «изменён», чтобы следующий
+    flush (например, в _update_all_topic_titles) не повторил UPDATE.
+    """
+    await db.execute(
+        update(Ticket)
+        .where(Ticket.id == ticket.id)
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+    set_committed_value(ticket, "status", status)
+
+
 async def cmd_work(message: Message, bot: Bot) -> None:
     """
     Команда /work - перевести тикет в работу.
@@ -835,7 +926,7 @@ async def cmd_work(message: Message, bot: Bot) -> None:
         return
 
     async with db_manager.session() as db:
-        tech_thread = await _get_tech_thread_by_location(
+        tech_thread, ticket = await _get_thread_and_ticket(
             db,
             message.chat.id,
             message.message_thread_id
@@ -845,8 +936,6 @@ async def cmd_work(message: Message, bot: Bot) -> None:
             await message.reply("❌ Топик не связан с тикетом")
             return
 
-        ticket = await _get_ticket_with_client(db, tech_thread.ticket_id)
-
         if not ticket:
             return
 
@@ -854,26 +943,18 @@ async def cmd_work(message: Message, bot: Bot) -> None:
         was_already_work = (ticket.status == TicketStatus.WORK)
 
         # Обновляем статус (даже если он уже WORK)
-        ticket.status = TicketStatus.WORK
-        await db.commit()
-
-        logger.info(f"🟡 Тикет #{ticket.id} {'уже был' if was_already_work else 'переведен'} в работу")
+        await _set_ticket_status(db, ticket, TicketStatus.WORK)
 
-        # Перезагружаем тикет с нужными связями
-        stmt = (
-            select(Ticket)
-            .options(
-                selectinload(Ticket.client),
-                selectinload(Ticket.assigned_tech),
-            )
-            .where(Ticket.id == ticket.id)
+        logger.info(
+            "🟡 Тикет #%s %s в работу",
+            ticket.id,
+            "уже был" if was_already_work else "переведен",
         )
-        result = await db.execute(stmt)
-        ticket_reloaded = result.scalar_one_or_none()
 
-        # ВСЕГДА обновляем названия топиков
-        if ticket_reloaded:
-            await _update_all_topic_titles(bot, ticket_reloaded, db)
+        # ВСЕГДА обновляем названия топиков.
+        # Тикет с client и assigned_tech загружен одним запросом выше и не
+        # протух после commit (expire_on_commit=False) — повторный SELECT не нужен.
+        await _update_all_topic_titles(bot, ticket, db)
 
         if was_already_work:
             await message.reply("🟡 Статус обновлен (уже в работе)")
@@ -892,7 +973,7 @@ async def cmd_done(message: Message, bot: Bot) -> None:
         return
 
     async with db_manager.session() as db:
-        tech_thread = await _get_tech_thread_by_location(
+        tech_thread, ticket = await _get_thread_and_ticket(
             db,
             message.chat.id,
             message.message_thread_id
@@ -902,8 +983,6 @@ async def cmd_done(message: Message, bot: Bot) -> None:
             await message.reply("❌ Топик не связан с тикетом")
             return
 
-        ticket = await _get_ticket_with_client(db, tech_thread.ticket_id)
-
         if not ticket:
             return
 
@@ -911,106 +990,106 @@ async def cmd_done(message: Message, bot: Bot) -> None:
         was_already_closed = (ticket.status == TicketStatus.CLOSED)
 
         # Обновляем статус (даже если он уже CLOSED)
-        ticket.status = TicketStatus.CLOSED
-        await db.commit()
-
-        logger.info(f"⚪️ Тикет #{ticket.id} {'уже был' if was_already_closed else 'переведен в'} закрыт")
+        await _set_ticket_status(db, ticket, TicketStatus.CLOSED)
 
-        # Перезагружаем тикет с нужными связями
-        stmt = (
-            select(Ticket)
-            .options(
-                selectinload(Ticket.client),
-                selectinload(Ticket.assigned_tech)
-            )
-            .where(Ticket.id == ticket.id)
+        logger.info(
+            "⚪️ Тикет #%s %s закрыт",
+            ticket.id,
+            "уже был" if was_already_closed else "переведен в",
         )
-        result = await db.execute(stmt)
-        ticket_reloaded = result.scalar_one_or_none()
 
-        # ВСЕГДА обновляем названия топиков
-        if ticket_reloaded:
-            await _update_all_topic_titles(bot, ticket_reloaded, db)
+        # Топик закрыт — следующий тикет клиента может его перепривязать
+        await cache.invalidate_tech_route(message.chat.id, message.message_thread_id)
 
-        # Закрываем топики
-        try:
-            await bot.close_forum_topic(
+        # ВСЕГДА обновляем названия топиков (в фоне, не задерживая ответ)
+        run_in_background(_update_topic_titles_background(bot, ticket))
+
+        # Закрываем главный и тех-топик параллельно
+        results = await asyncio.gather(
+            bot.close_forum_topic(
                 chat_id=ticket.main_chat_id,
                 message_thread_id=ticket.main_thread_id
-            )
-
-            await bot.close_forum_topic(
+            ),
+            bot.close_forum_topic(
                 chat_id=message.chat.id,
                 message_thread_id=message.message_thread_id
-            )
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("❌ Ошибка закрытия топиков: %s", result)
 
-            if was_already_closed:
-                await message.reply("⚪️ Статус обновлен (уже закрыт)")
-            else:
-                await message.reply("⚪️ Закрыт")
-        except Exception as e:
-            logger.error(f"❌ Ошибка закрытия топиков: {e}")
-            if was_already_closed:
-                await message.reply("⚪️ Статус обновлен (уже закрыт)")
-            else:
-                await message.reply("⚪️ Закрыт")
+        if was_already_closed:
+            await message.reply("⚪️ Статус обновлен (уже закрыт)")
+        else:
+            await message.reply("⚪️ Закрыт")
 
 
 # ─────────────────────────────────────────────
 #  Inline режим
 # ─────────────────────────────────────────────
 
+# Подсказки по командам не меняются — собираем их один раз при импорте
+_INLINE_RESULTS: tuple[InlineQueryResultArticle, ...] = (
+    InlineQueryResultArticle(
+        id="staff",
+        title="💼 /s - Служебная заметка",
+        description="Отправить заметку только в главную группу (не клиенту)",
+        input_message_content=InputTextMessageContent(
+            message_text="/s "
+        )
+    ),
+    InlineQueryResultArticle(
+        id="internal",
+        title="📝 /i - Внутренняя заметка",
+        description="Заметка только для вашей группы",
+        input_message_content=InputTextMessageContent(
+            message_text="/i "
+        )
+    ),
+    InlineQueryResultArticle(
+        id="work",
+        title="🟡 /work - В работу",
+        description="Перевести тикет в статус 'В работе'",
+        input_message_content=InputTextMessageContent(
+            message_text="/work"
+        )
+    ),
+    InlineQueryResultArticle(
+        id="done",
+        title="⚪️ /done - Закрыть",
+        description="Закрыть тикет и отправить опрос клиенту",
+        input_message_content=InputTextMessageContent(
+            message_text="/done"
+        )
+    ),
+)
+
+# (результат, строка для поиска) — title и description уже в нижнем регистре
+_INLINE_SEARCH_INDEX: tuple[tuple[InlineQueryResultArticle, str], ...] = tuple(
+    (r, f"{r.title.lower()}\n{r.description.lower()}")
+    for r in _INLINE_RESULTS
+)
+
+
 async def inline_query_handler(inline_query: InlineQuery) -> None:
     """
     Обработка inline запросов для подсказок по командам.
     """
-    results = [
-        InlineQueryResultArticle(
-            id="staff",
-            title="💼 /s - Служебная заметка",
-            description="Отправить заметку только в главную группу (не клиенту)",
-            input_message_content=InputTextMessageContent(
-                message_text="/s "
-            )
-        ),
-        InlineQueryResultArticle(
-            id="internal",
-            title="📝 /i - Внутренняя заметка",
-            description="Заметка только для вашей группы",
-            input_message_content=InputTextMessageContent(
-                message_text="/i "
-            )
-        ),
-        InlineQueryResultArticle(
-            id="work",
-            title="🟡 /work - В работу",
-            description="Перевести тикет в статус 'В работе'",
-            input_message_content=InputTextMessageContent(
-                message_text="/work"
-            )
-        ),
-        InlineQueryResultArticle(
-            id="done",
-            title="⚪️ /done - Закрыть",
-            description="Закрыть тикет и отправить опрос клиенту",
-            input_message_content=InputTextMessageContent(
-                message_text="/done"
-            )
-        ),
-    ]
-
     # Фильтруем результаты по запросу
     query = inline_query.query.lower()
     if query:
-        results = [
-            r for r in results
-            if query in r.title.lower() or query in r.description.lower()
-        ]
+        results = [r for r, haystack in _INLINE_SEARCH_INDEX if query in haystack]
+    else:
+        results = list(_INLINE_RESULTS)
 
+    # Подсказки статичны и одинаковы для всех — Telegram может отдавать их из
+    # своего кеша, не обращаясь к боту
     await inline_query.answer(
         results,
-        cache_time=1,
-        is_personal=True
+        cache_time=300,
+        is_personal=False
     )
 
 
@@ -1033,38 +1112,33 @@ def register_handlers(dp: Dispatcher) -> None:
     dp.message.register(
         cmd_staff,
         Command("staff", "s", "lead", "l"),
-        F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}),
-        F.message_thread_id,
+        _GROUP_TOPIC,
     )
 
     dp.message.register(
         cmd_internal,
         Command("internal", "i"),
-        F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}),
-        F.message_thread_id,
+        _GROUP_TOPIC,
     )
     
     # Команда отправки опроса
     dp.message.register(
         cmd_feedback,
         Command("feed", "f"),
-        F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}),
-        F.message_thread_id,
+        _GROUP_TOPIC,
     )
 
     # Команды статусов
     dp.message.register(
         cmd_work,
         Command("work"),
-        F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}),
-        F.message_thread_id,
+        _GROUP_TOPIC,
     )
 
     dp.message.register(
         cmd_done,
         Command("done"),
-        F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}),
-        F.message_thread_id,
+        _GROUP_TOPIC,
     )
     
     # Кнопка отправки опроса
@@ -1076,10 +1150,9 @@ def register_handlers(dp: Dispatcher) -> None:
     # Зеркалирование обычных сообщений
     dp.message.register(
         handle_tech_group_message,
-        F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}),
+        _GROUP_TOPIC,
         F.chat.id != settings.main_group_id,
-        F.message_thread_id,
-        F.text | F.photo | F.video | F.document | F.voice | F.audio,
+        _MIRRORED_CONTENT,
     )
 
     logger.info("✅ Зарегистрированы обработчики для зеркалирования из групп техников")
@@ -1,20 +1,23 @@
 # app/bot/handlers/user_bot.py
 from __future__ import annotations
 
+import asyncio
 import logging
 from typing import Any, Dict, Optional
 
 from aiogram import Dispatcher, F, Bot
-from aiogram.fsm.context import FSMContext
+from aiogram.filters import StateFilter
 from aiogram.enums import ChatType
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import Message, InlineKeyboardMarkup
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from sqlalchemy import select
+from sqlalchemy import and_, desc, inspect as sa_inspect, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Load, joinedload
 
+from app.bot.keyboards.main_group import status_kb
 from app.config import settings
-from app.db.models import TicketStatus, Actor, Ticket, User, TechThread
+from app.db.models import TicketStatus, Actor, Ticket, User, TechThread, Technician
 from app.db.crud.user import get_or_create_user
 from app.db.crud.ticket import TicketCRUD, add_event, get_tech_thread_by_user_and_tech
 from app.db.crud.tech import (
@@ -26,7 +29,10 @@ from app.db.crud.tech import (
 from app.db.crud.message import TicketMessageCRUD
 from app.db.database import db_manager
 from app.services.gspread_client import find_in_column_j_across_sheets
+from app.utils.background import run_in_background
 from app.utils.cache import cache
+from app.utils.telegram import extract_consonants, extract_media, status_emoji
+from app.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -35,11 +41,39 @@ logger = logging.getLogger(__name__)
 # ─────────────────────────────────────────────
 
 
+# tg_id -> данные клиента (None тоже кешируем: «нет в таблице»)
+_sheets_cache: TTLCache[int, Optional[Dict[str, Any]]] = TTLCache(maxsize=2048, ttl=300)
+# tg_id -> запрос к таблице, который уже выполняется (шапки в main и тех-топике)
+_sheets_inflight: dict[int, asyncio.Task] = {}
+_MISSING: Any = object()
+
+
 async def get_client_data_from_sheets(tg_id: int) -> Optional[Dict[str, Any]]:
-    return await find_in_column_j_across_sheets(
-        spreadsheet=settings.gspread_spreadsheet,
-        value=tg_id,
-    )
+    """
+    Данные клиента из Google Sheets.
+
+    Ответ кешируется на 5 минут в памяти процесса: таблица медленная
+    и с лимитами, а шапка клиента строится несколько раз на тикет.
+    """
+    cached = _sheets_cache.get(tg_id, _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    # Параллельные запросы по одному клиенту ждут один и тот же вызов
+    task = _sheets_inflight.get(tg_id)
+    if task is None:
+        task = asyncio.create_task(
+            find_in_column_j_across_sheets(
+                spreadsheet=settings.gspread_spreadsheet,
+                value=tg_id,
+            )
+        )
+        _sheets_inflight[tg_id] = task
+        task.add_done_callback(lambda _: _sheets_inflight.pop(tg_id, None))
+
+    data = await asyncio.shield(task)
+    _sheets_cache.set(tg_id, data)
+    return data
 
 
 # ─────────────────────────────────────────────
@@ -62,13 +96,6 @@ async def _get_tech_thread(
     res = await session.execute(stmt)
     return res.scalar_one_or_none()
 
-def _status_emoji(status: TicketStatus) -> str:
-    return {
-        TicketStatus.NEW: "🟢",
-        TicketStatus.WORK: "🟡",
-        TicketStatus.CLOSED: "⚪️",
-    }.get(status, "⚪️")
-
 
 def _build_topic_title(user: User, status: TicketStatus, assigned: bool) -> str:
     """
@@ -76,7 +103,7 @@ def _build_topic_title(user: User, status: TicketStatus, assigned: bool) -> str:
       🟢 [-] Имя (@username)
     Пока тикет никому не передан — добавляем тег [-].
     """
-    parts: list[str] = [_status_emoji(status)]
+    parts: list[str] = [status_emoji(status)]
     if not assigned:
         parts.append("[-]")
 
@@ -94,70 +121,107 @@ def _build_topic_title(user: User, status: TicketStatus, assigned: bool) -> str:
     return " ".join(parts)
 
 
+# Поля шапки из таблицы: (ключ, шаблон строки) — в порядке вывода
+_SHEET_FIELDS: tuple[tuple[str, str], ...] = (
+    ("fio", "ФИО: {}"),
+    ("city", "Город: {}"),
+    ("model", "Модель: {}"),
+    ("serial", "Серийный номер: <code>{}</code>"),
+    ("warranty_date", "Дата активации гарантии: {}"),
+    ("order_date", "Дата заказа: {}"),
+    ("platform", "Площадка: {}"),
+    ("phone", "Телефон: <code>{}</code>"),
+)
+_TG_LINE = "TG: <a href=\"tg://user?id={}\">{}</a>"
+_USERNAME_LINE = "Username: @{}"
+
+
 def _build_client_header(user: User, sheet: Optional[Dict[str, Any]]) -> str:
     """
     Текст шапки клиента: работает строго с колонками по индексам A–M.
     """
+    tg_line = _TG_LINE.format(user.tg_id, user.first_name or user.username or user.tg_id)
+
     if sheet is None:
-        return (
-            "<b>Новый клиент</b>\n\n"
-            f"TG: <a href=\"tg://user?id={user.tg_id}\">{user.first_name or user.username or user.tg_id}</a>"
-            + (f"\nUsername: @{user.username}" if user.username else "")
+        lines = ["<b>Новый клиент</b>", "", tg_line]
+    else:
+        lines = ["<b>Клиент по базе</b>"]
+        lines.extend(
+            template.format(sheet[key])
+            for key, template in _SHEET_FIELDS
+            if sheet.get(key)
         )
+        lines.append("")
+        lines.append(tg_line)
 
-    lines = ["<b>Клиент по базе</b>"]
-
-    if sheet.get("fio"):
-        lines.append(f"ФИО: {sheet['fio']}")
+    if user.username:
+        lines.append(_USERNAME_LINE.format(user.username))
 
-    if sheet.get("city"):
-        lines.append(f"Город: {sheet['city']}")
+    return "\n".join(lines)
 
-    if sheet.get("model"):
-        lines.append(f"Модель: {sheet['model']}")
 
-    if sheet.get("serial"):
-        lines.append(f"Серийный номер: <code>{sheet['serial']}</code>")
+def _build_loading_header(user: User) -> str:
+    """Временная шапка, пока идёт запрос к Google Sheets."""
+    lines = [
+        "<b>Клиент</b>",
+        "⏳ Загружаем данные из таблицы...",
+        "",
+        _TG_LINE.format(user.tg_id, user.first_name or user.username or user.tg_id),
+    ]
+    if user.username:
+        lines.append(_USERNAME_LINE.format(user.username))
+    return "\n".join(lines)
 
-    if sheet.get("warranty_date"):
-        lines.append(f"Дата активации гарантии: {sheet['warranty_date']}")
 
-    if sheet.get("order_date"):
-        lines.append(f"Дата заказа: {sheet['order_date']}")
+async def _enrich_client_header(
+    bot: Bot,
+    chat_id: int,
+    message_id: int,
+    user: User,
+) -> None:
+    """Дождаться данных из таблицы и заменить временную шапку на полную."""
+    try:
+        sheet_data = await get_client_data_from_sheets(user.tg_id)
+        await bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=message_id,
+            text=_build_client_header(user, sheet_data),
+            parse_mode="HTML",
+            disable_web_page_preview=True,
+        )
+    except Exception as e:
+        logger.warning("⚠️ Не удалось дополнить шапку клиента данными из таблицы: %s", e)
 
-    if sheet.get("platform"):
-        lines.append(f"Площадка: {sheet['platform']}")
 
-    if sheet.get("phone"):
-        lines.append(f"Телефон: <code>{sheet['phone']}</code>")
+async def _send_client_header(
+    bot: Bot,
+    chat_id: int,
+    thread_id: int,
+    user: User,
+) -> Message:
+    """
+    Отправить шапку клиента, не дожидаясь Google Sheets.
 
-    lines.append("")
-    lines.append(
-        f"TG: <a href=\"tg://user?id={user.tg_id}\">{user.first_name or user.username or user.tg_id}</a>"
+    Если данные клиента уже в кеше — сразу полная шапка.
+    Иначе отправляем временную и дополняем её фоновой задачей.
+    """
+    sheet_data = _sheets_cache.get(user.tg_id, _MISSING)
+    if sheet_data is _MISSING:
+        text = _build_loading_header(user)
+    else:
+        text = _build_client_header(user, sheet_data)
+
+    msg = await bot.send_message(
+        chat_id=chat_id,
+        message_thread_id=thread_id,
+        text=text,
+        parse_mode="HTML",
+        disable_web_page_preview=True,
     )
 
-    if user.username:
-        lines.append(f"Username: @{user.username}")
-
-    return "\n".join(lines)
-
-def _extract_consonants(name: str, count: int = 3) -> str:
-    """Извлечь первые N согласных букв из имени (как в main_group)."""
-    consonants_ru = "БВГДЖЗЙКЛМНПРСТФХЦЧШЩбвгджзйклмнпрстфхцчшщ"
-    consonants_en = "BCDFGHJKLMNPQRSTVWXYZbcdfghjklmnpqrstvwxyz"
-
-    result: list[str] = []
-    for ch in name:
-        if ch in consonants_ru or ch in consonants_en:
-            result.append(ch.upper())
-            if len(result) >= count:
-                break
-
-    # если согласных мало — добираем первыми буквами
-    if len(result) < 2:
-        result = [c.upper() for c in name[:count] if c.isalpha()]
-
-    return "".join(result[:count]) or "???"
+    if sheet_data is _MISSING:
+        run_in_background(_enrich_client_header(bot, chat_id, msg.message_id, user))
+    return msg
 
 
 def _build_main_topic_title_with_tech(
@@ -170,7 +234,7 @@ def _build_main_topic_title_with_tech(
       🟢 [ТСТ] Имя (@username)
       или без тега, если tech_tag=None.
     """
-    emoji = _status_emoji(status)
+    emoji = status_emoji(status)
     parts: list[str] = [emoji]
 
     if tech_tag is not None:
@@ -202,13 +266,18 @@ async def _build_technicians_keyboard(
         [Тех3] [Тех4]
     callback_data: assign_tech:<ticket_id>:<tech_id>
     """
-    technicians = await get_technicians(session=session, active_only=True)
+    # Список меняется редко — берём из кеша, в БД идём только при промахе
+    technicians = await cache.get_technicians()
+    if technicians is None:
+        techs = await get_technicians(session=session, active_only=True)
+        technicians = [{"id": t.id, "name": t.name} for t in techs]
+        await cache.set_technicians(technicians)
 
     kb = InlineKeyboardBuilder()
     for tech in technicians:
         kb.button(
-            text=tech.name,
-            callback_data=f"assign_tech:{ticket_id}:{tech.id}",
+            text=tech["name"],
+            callback_data=f"assign_tech:{ticket_id}:{tech['id']}",
         )
     # по 2 кнопки в ряд
     kb.adjust(2)
@@ -222,20 +291,38 @@ async def _build_technicians_keyboard(
 async def _get_last_ticket_for_client(
     session: AsyncSession,
     client_tg_id: int,
-) -> Optional[Ticket]:
+) -> tuple[Optional[Ticket], Optional[TechThread]]:
     """
-    Последний тикет клиента (по created_at DESC).
-    """
-    from sqlalchemy import select, desc
+    Последний тикет клиента (по created_at DESC) и его тех-топик
+    у назначенного техника.
 
+    Назначенный техник и TechThread приходят тем же запросом (JOIN);
+    остальные связи (client, messages, tech_threads) на этом пути не нужны —
+    raiseload, чтобы случайное обращение к ним не порождало лишних SELECT.
+    """
     stmt = (
-        select(Ticket)
+        select(Ticket, TechThread)
+        .outerjoin(
+            TechThread,
+            and_(
+                TechThread.ticket_id == Ticket.id,
+                TechThread.tech_id == Ticket.assigned_tech_id,
+            ),
+        )
+        .options(
+            joinedload(Ticket.assigned_tech).raiseload("*"),
+            Load(Ticket).raiseload("*"),
+            Load(TechThread).raiseload("*"),
+        )
         .where(Ticket.client_tg_id == client_tg_id)
         .order_by(desc(Ticket.created_at))
         .limit(1)
     )
     res = await session.execute(stmt)
-    return res.scalar_one_or_none()
+    row = res.first()
+    if row is None:
+        return None, None
+    return row[0], row[1]
 
 
 async def _ensure_topic_and_ticket(
@@ -243,7 +330,7 @@ async def _ensure_topic_and_ticket(
     bot: Bot,
     session: AsyncSession,
     user: User,
-) -> tuple[Ticket, int, bool]:
+) -> tuple[Ticket, int, bool, Optional[TechThread]]:
     """
     Гарантирует, что у пользователя есть:
 
@@ -251,7 +338,9 @@ async def _ensure_topic_and_ticket(
       • Актуальный тикет (status != CLOSED)
 
     Возвращает:
-      (ticket, topic_id, is_new_ticket)
+      (ticket, topic_id, is_new_ticket, tech_thread)
+      tech_thread — тех-топик назначенного техника: найденный вместе с тикетом
+      или созданный при автоназначении (иначе None)
 
     Если предыдущий тикет был CLOSED — создаём новый, но в ТОМ ЖЕ топике:
       • переименовываем топик под новый тикет
@@ -259,9 +348,13 @@ async def _ensure_topic_and_ticket(
     """
     support_chat_id = settings.main_group_id
 
-    last_ticket = await _get_last_ticket_for_client(session=session, client_tg_id=user.tg_id)
+    last_ticket, last_tech_thread = await _get_last_ticket_for_client(
+        session=session,
+        client_tg_id=user.tg_id,
+    )
     topic_id: Optional[int] = None
     ticket: Optional[Ticket] = None
+    tech_thread: Optional[TechThread] = None
     is_new_ticket = False
 
     if (
@@ -272,6 +365,7 @@ async def _ensure_topic_and_ticket(
         topic_id = last_ticket.main_thread_id
         if last_ticket.status != TicketStatus.CLOSED:
             ticket = last_ticket
+            tech_thread = last_tech_thread
 
     # Если нет актуального тикета — создаём новый
     if ticket is None:
@@ -300,26 +394,25 @@ async def _ensure_topic_and_ticket(
             except TelegramBadRequest as e:
                 logger.warning("Не удалось переименовать форум-топик: %s", e)
 
-        # создаём новый тикет с привязкой к этому топику
+        # Попробуем автоназначить техника по его часам
+        try:
+            auto_tech = await get_auto_assign_technician_for_now(session=session)
+        except Exception as e:
+            logger.error("❌ Ошибка подбора техника для автоназначения: %s", e)
+            auto_tech = None
+
+        # создаём новый тикет с привязкой к этому топику (и сразу с техником)
         ticket = await TicketCRUD.create_ticket(
             session=session,
             client_tg_id=user.tg_id,
             main_chat_id=support_chat_id,
             main_thread_id=topic_id,
+            assigned_tech_id=auto_tech.id if auto_tech else None,
             actor=Actor.CLIENT,
         )
         is_new_ticket = True
 
-        # Попробуем автоназначить техника по его часам
-        try:
-            auto_tech = await get_auto_assign_technician_for_now(session=session)
-        except Exception as e:
-            logger.error("❌ Ошибка подбора техника для автоназначения: %s", e)
-            auto_tech = None
-
         if auto_tech:
-            ticket.assigned_tech_id = auto_tech.id
-            await session.flush()
             logger.info(
                 "🤖 Автоматически назначен техник %s (ID=%s) на тикет #%s",
                 auto_tech.name,
@@ -329,7 +422,7 @@ async def _ensure_topic_and_ticket(
 
             # Обновляем название топика в главной группе: добавляем [ТЕГ]
             try:
-                tag = _extract_consonants(auto_tech.name)
+                tag = extract_consonants(auto_tech.name)
                 new_title = _build_main_topic_title_with_tech(
                     user=user,
                     status=ticket.status,
@@ -350,125 +443,17 @@ async def _ensure_topic_and_ticket(
                     e,
                 )
             # Создаём тех-топик и отправляем шапку/кнопки/первое сообщение в группу техника
-            try:
-                from app.db.crud.tech import get_technician_by_id, get_or_create_tech_thread
-                from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-
-                tech = await get_technician_by_id(session=session, tech_id=auto_tech.id)
-                if tech and tech.group_chat_id:
-                    # формируем название топика для техники (без тега)
-                    tech_topic_title = _build_main_topic_title_with_tech(
+            if auto_tech.group_chat_id:
+                try:
+                    tech_thread = await _bootstrap_tech_topic(
+                        bot=bot,
+                        session=session,
                         user=user,
-                        status=ticket.status,
-                        tech_tag=None,
+                        ticket=ticket,
+                        tech=auto_tech,
                     )
-                    try:
-                        topic = await bot.create_forum_topic(
-                            chat_id=tech.group_chat_id,
-                            name=tech_topic_title,
-                        )
-                    except TelegramBadRequest as e:
-                        logger.error(
-                            "❌ Не удалось создать тех-топик при автоназначении: %s",
-                            e,
-                        )
-                        topic = None
-
-                    tech_thread = None
-                    if topic:
-                        tech_thread = await get_or_create_tech_thread(
-                            session=session,
-                            ticket_id=ticket.id,
-                            user_id=ticket.client_tg_id,
-                            tech_id=tech.id,
-                            tech_chat_id=tech.group_chat_id,
-                            tech_thread_id=topic.message_thread_id,
-                        )
-
-                    # отправляем шапку
-                    if tech_thread:
-                        try:
-                            sheet_data = await get_client_data_from_sheets(user.tg_id)
-                            header_text = _build_client_header(user, sheet_data)
-                            await bot.send_message(
-                                chat_id=tech_thread.tech_chat_id,
-                                message_thread_id=tech_thread.tech_thread_id,
-                                text=header_text,
-                                parse_mode="HTML",
-                                disable_web_page_preview=True,
-                            )
-                            logger.info("✅ Шапка клиента отправлена в тех-топик (автоназначение)")
-                        except Exception as e:
-                            logger.error("❌ Ошибка при отправке шапки клиента в тех-топик: %s", e)
-
-                        # кнопки управления статусом
-                        try:
-                            status_kb = InlineKeyboardMarkup(
-                                inline_keyboard=[[
-                                    InlineKeyboardButton(
-                                        text="🟡 В работе",
-                                        callback_data=f"status_work:{ticket.id}",
-                                    ),
-                                    InlineKeyboardButton(
-                                        text="⚪️ Закрыть",
-                                        callback_data=f"status_close:{ticket.id}",
-                                    ),
-                                ]]
-                            )
-                            status_msg = await bot.send_message(
-                                chat_id=tech_thread.tech_chat_id,
-                                message_thread_id=tech_thread.tech_thread_id,
-                                text="🎛 <b>Управление статусом:</b>",
-                                reply_markup=status_kb,
-                                parse_mode="HTML",
-                            )
-                            try:
-                                await bot.pin_chat_message(
-                                    chat_id=tech_thread.tech_chat_id,
-                                    message_id=status_msg.message_id,
-                                    disable_notification=True,
-                                )
-                                logger.info("📌 Кнопки статусов закреплены в тех-топике (автоназначение)")
-                            except Exception as e:
-                                logger.warning(
-                                    "⚠️ Не удалось закрепить кнопки статусов в тех-топике: %s",
-                                    e,
-                                )
-                        except Exception as e:
-                            logger.error("❌ Ошибка отправки кнопок статусов в тех-топик: %s", e)
-
-                        # копируем первое сообщение клиента в тех-топик и сохраняем
-                        try:
-                            sent_msg = await bot.copy_message(
-                                chat_id=tech_thread.tech_chat_id,
-                                message_thread_id=tech_thread.tech_thread_id,
-                                from_chat_id=message.chat.id,
-                                message_id=message.message_id,
-                            )
-                            logger.info("✅ Первое сообщение отправлено в тех-группу (автоназначение)")
-                            try:
-                                await bot.pin_chat_message(
-                                    chat_id=tech_thread.tech_chat_id,
-                                    message_id=sent_msg.message_id,
-                                    disable_notification=True,
-                                )
-                            except Exception:
-                                pass
-
-                            await TicketMessageCRUD.add_message(
-                                session=session,
-                                ticket_id=ticket.id,
-                                user_id=user.tg_id,
-                                message_text=message.text or message.caption or "[медиа]",
-                                is_from_admin=False,
-                                telegram_message_id=sent_msg.message_id,
-                            )
-                        except TelegramBadRequest as e:
-                            logger.warning("⚠️ Не удалось скопировать сообщение в тех-группу: %s", e)
-                        except Exception as e:
-                            logger.error("❌ Ошибка при копировании первого сообщения в тех-топик: %s", e)
-            except Exception:
-                logger.exception("❌ Непредвиденная ошибка при создании тех-топика при автоназначении")
+                except Exception:
+                    logger.exception("❌ Непредвиденная ошибка при создании тех-топика при автоназначении")
 
             # Если были изменения при автоназначении — зафиксируем их немедленно,
             # чтобы последующие вебхуки (сообщения в главной группе) видели назначение
@@ -477,115 +462,118 @@ async def _ensure_topic_and_ticket(
             except Exception as e:
                 logger.warning("⚠️ Не удалось закоммитить сессию после автоназначения: %s", e)
 
-
-    assert topic_id is not None
-    return ticket, topic_id, is_new_ticket
+    if topic_id is None:
+        # Сюда не попадаем: топик либо найден, либо создан выше (иначе raise)
+        raise RuntimeError(f"Нет топика для тикета #{ticket.id}")
+    return ticket, topic_id, is_new_ticket, tech_thread
 
 
 # ─────────────────────────────────────────────
 #  Отправка в топик
 # ─────────────────────────────────────────────
 
-async def _send_header_and_first_message(
+async def _bootstrap_tech_topic(
     *,
     bot: Bot,
     session: AsyncSession,
     user: User,
     ticket: Ticket,
-    topic_id: int,
-    message: Message,
-) -> None:
+    tech: Technician,
+) -> TechThread | None:
     """
-    Для нового тикета:
-      1) шапка с данными клиента
-      2) копия сообщения клиента с клавиатурой выбора техника
-      3) сохранение сообщения в БД
-      4) кнопки управления статусом
-      5) закрепление сообщений
+    Создать тех-топик в группе техника и наполнить его:
+      1) форум-топик + запись TechThread
+      2) шапка клиента и кнопки статусов — параллельно
+      3) закрепление кнопок статусов
+
+    Первое сообщение клиента копируется отдельно, вместе с копией
+    в главную группу (см. _send_header_and_first_message).
+    У техника должен быть group_chat_id.
     """
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+    # 👤 Название топика техника (как в main_group: без тега)
+    tech_topic_title = _build_main_topic_title_with_tech(
+        user=user,
+        status=ticket.status,
+        tech_tag=None,
+    )
 
-    sheet_data = await get_client_data_from_sheets(user.tg_id)
-    header_text = _build_client_header(user, sheet_data)
     try:
-        status_keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                    [InlineKeyboardButton(
-                        text="🟡 В работе",
-                        callback_data=f"status_work:{ticket.id}"
-                    ),
-                    InlineKeyboardButton(
-                        text="⚪️ Закрыть",
-                        callback_data=f"status_close:{ticket.id}"
-                    )
-                ]
-            ]
+        topic = await bot.create_forum_topic(
+            chat_id=tech.group_chat_id,
+            name=tech_topic_title,
         )
+    except TelegramBadRequest as e:
+        logger.error("❌ Не удалось создать тех-топик: %s", e, exc_info=True)
+        return None
 
-        status_msg = await bot.send_message(
-            chat_id=settings.main_group_id,
-            message_thread_id=topic_id,
-            text="<b>Управление статусом:</b>",
-            reply_markup=status_keyboard,
-            parse_mode="HTML"
-        )
+    # ✅ Создаём / получаем запись тех-топика в БД (без двойного insert)
+    tech_thread = await get_or_create_tech_thread(
+        session=session,
+        ticket_id=ticket.id,
+        user_id=ticket.client_tg_id,
+        tech_id=tech.id,
+        tech_chat_id=tech.group_chat_id,
+        tech_thread_id=topic.message_thread_id,
+    )
+    logger.info(
+        "✅ Создан тех-топик: ticket_id=%s tech_id=%s group=%s topic_id=%s",
+        ticket.id,
+        tech.id,
+        tech_thread.tech_chat_id,
+        tech_thread.tech_thread_id,
+    )
 
-        # Закрепляем кнопки статусов
-        try:
-            await bot.pin_chat_message(
-                chat_id=settings.main_group_id,
-                message_id=status_msg.message_id,
-                disable_notification=True,
-            )
-            logger.info("📌 Кнопки статусов закреплены")
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось закрепить кнопки статусов: {e}")
+    chat_id = tech_thread.tech_chat_id
+    thread_id = tech_thread.tech_thread_id
+
+    # 📋 Шапка и 🎛 кнопки статусов — одновременно
+    header_res, status_res = await asyncio.gather(
+        _send_client_header(bot, chat_id, thread_id, user),
+        bot.send_message(
+            chat_id=chat_id,
+            message_thread_id=thread_id,
+            text="🎛 <b>Управление статусом:</b>",
+            reply_markup=status_kb(ticket.id),
+            parse_mode="HTML",
+        ),
+        return_exceptions=True,
+    )
 
-    except Exception as e:
-        logger.error(f"❌ Ошибка отправки кнопок статусов: {e}")
+    if isinstance(header_res, BaseException):
+        logger.error("❌ Ошибка отправки шапки клиента в тех-топик: %s", header_res)
+    else:
+        logger.info("✅ Шапка клиента отправлена в тех-топик")
 
-    # 1) шапка в главной группе
-    await bot.send_message(
-        chat_id=settings.main_group_id,
-        message_thread_id=topic_id,
-        text=header_text,
-        parse_mode="HTML",
-        disable_web_page_preview=True,
-    )
+    if isinstance(status_res, BaseException):
+        logger.error("❌ Ошибка отправки кнопок статусов в тех-топик: %s", status_res)
+        return tech_thread
 
-    # 2) Кого назначаем техником — клавиатура
-    kb_tech = await _build_technicians_keyboard(ticket.id, session)
-    await bot.send_message(
-        chat_id=settings.main_group_id,
-        message_thread_id=topic_id,
-        text="Техники для назначения:",
-        parse_mode="HTML",
-        disable_web_page_preview=True,
-        reply_markup=kb_tech,
-    )
+    # 📌 Закрепляем кнопки статусов
+    try:
+        await bot.pin_chat_message(
+            chat_id=chat_id,
+            message_id=status_res.message_id,
+            disable_notification=True,
+        )
+        logger.info("📌 Кнопки статусов закреплены в тех-топике")
+    except Exception as e:
+        logger.warning("⚠️ Не удалось закрепить кнопки статусов в тех-топике: %s", e)
 
-    media_type = None
-    media_file_id = None
-    media_caption = None
-
-    if message.photo:
-        media_type = "photo"
-        media_file_id = message.photo[-1].file_id
-        media_caption = message.caption
-    elif message.video:
-        media_type = "video"
-        media_file_id = message.video.file_id
-        media_caption = message.caption
-    elif message.document:
-        media_type = "document"
-        media_file_id = message.document.file_id
-        media_caption = message.caption
-    elif message.voice:
-        media_type = "voice"
-        media_file_id = message.voice.file_id
+    return tech_thread
 
-    message_text = message.text or message.caption or "[медиа]"
 
+async def _copy_first_message(
+    *,
+    bot: Bot,
+    topic_id: int,
+    message: Message,
+) -> tuple[Message, bool]:
+    """
+    Скопировать первое сообщение клиента в топик главной группы.
+
+    Если сообщение нельзя скопировать — отправляем его текстом.
+    Возвращает (отправленное сообщение, была ли это копия).
+    """
     try:
         sent_msg = await bot.copy_message(
             chat_id=settings.main_group_id,
@@ -594,76 +582,167 @@ async def _send_header_and_first_message(
             message_id=message.message_id,
         )
         logger.info("✅ Первое сообщение отправлено в главную группу")
+        return sent_msg, True
+    except TelegramBadRequest as e:
+        if "can't be copied" not in str(e).lower():
+            raise
 
-        # ЗАКРЕПЛЯЕМ первое сообщение
-        try:
-            await bot.pin_chat_message(
-                chat_id=settings.main_group_id,
-                message_id=sent_msg.message_id,
+    text = message.text or message.caption or "[медиа]"
+    sent_msg = await bot.send_message(
+        chat_id=settings.main_group_id,
+        message_thread_id=topic_id,
+        text=f"Сообщение от клиента:\n\n{text}",
+    )
+    return sent_msg, False
+
+
+async def _send_header_and_first_message(
+    *,
+    bot: Bot,
+    session: AsyncSession,
+    user: User,
+    ticket: Ticket,
+    topic_id: int,
+    message: Message,
+    tech_thread: TechThread | None = None,
+) -> None:
+    """
+    Для нового тикета:
+      1) кнопки управления статусом, шапка с данными клиента,
+         клавиатура выбора техника и копия сообщения клиента
+         (отправляются параллельно); если тикет автоназначен —
+         в том же запуске копия уходит и в тех-топик
+      2) закрепление кнопок статусов и первого сообщения (параллельно)
+      3) сохранение сообщения и события в БД
+    """
+    kb_tech = await _build_technicians_keyboard(ticket.id, session)
+
+    # Копия первого сообщения в тех-топик (при автоназначении)
+    tech_copy = []
+    if tech_thread is not None:
+        tech_copy.append(
+            bot.copy_message(
+                chat_id=tech_thread.tech_chat_id,
+                message_thread_id=tech_thread.tech_thread_id,
+                from_chat_id=message.chat.id,
+                message_id=message.message_id,
+            )
+        )
+
+    # 1) Все сообщения в топик (и копия в тех-топик) уходят одновременно
+    status_res, header_res, _kb_res, first_res, *tech_res = await asyncio.gather(
+        bot.send_message(
+            chat_id=settings.main_group_id,
+            message_thread_id=topic_id,
+            text="<b>Управление статусом:</b>",
+            reply_markup=status_kb(ticket.id),
+            parse_mode="HTML"
+        ),
+        _send_client_header(bot, settings.main_group_id, topic_id, user),
+        bot.send_message(
+            chat_id=settings.main_group_id,
+            message_thread_id=topic_id,
+            text="Техники для назначения:",
+            parse_mode="HTML",
+            disable_web_page_preview=True,
+            reply_markup=kb_tech,
+        ),
+        _copy_first_message(bot=bot, topic_id=topic_id, message=message),
+        *tech_copy,
+        return_exceptions=True,
+    )
+    tech_msg = tech_res[0] if tech_res else None
+
+    if isinstance(tech_msg, BaseException):
+        logger.warning("⚠️ Не удалось скопировать сообщение в тех-группу: %s", tech_msg)
+        tech_msg = None
+    elif tech_msg is not None:
+        logger.info("✅ Первое сообщение отправлено в тех-группу (автоназначение)")
+
+    if isinstance(status_res, BaseException):
+        logger.error("❌ Ошибка отправки кнопок статусов: %s", status_res)
+    if isinstance(first_res, BaseException):
+        logger.error("❌ Ошибка отправки первого сообщения: %s", first_res)
+        raise first_res
+    if isinstance(header_res, BaseException):
+        raise header_res
+
+    sent_msg, copied = first_res
+
+    # 2) Закрепляем кнопки статусов и первое сообщение (в обеих группах)
+    pins = [(settings.main_group_id, sent_msg.message_id)]
+    if not isinstance(status_res, BaseException):
+        pins.append((settings.main_group_id, status_res.message_id))
+    if tech_msg is not None:
+        pins.append((tech_thread.tech_chat_id, tech_msg.message_id))
+
+    pin_results = await asyncio.gather(
+        *(
+            bot.pin_chat_message(
+                chat_id=chat_id,
+                message_id=message_id,
                 disable_notification=True,
             )
-            logger.info("📌 Первое сообщение закреплено")
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось закрепить сообщение: {e}")
+            for chat_id, message_id in pins
+        ),
+        return_exceptions=True,
+    )
+    for (chat_id, message_id), res in zip(pins, pin_results):
+        if isinstance(res, BaseException):
+            logger.warning("⚠️ Не удалось закрепить сообщение %s в чате %s: %s", message_id, chat_id, res)
+        else:
+            logger.info("📌 Сообщение %s закреплено в чате %s", message_id, chat_id)
 
-        # 3) Сохраняем в БД
-        await TicketMessageCRUD.add_message(
+    # 3) Сохраняем в БД
+    message_text = message.text or message.caption or "[медиа]"
+
+    first_event = {
+        "telegram_message_id": message.message_id,
+        "chat_id": message.chat.id,
+        "text": message_text,
+        "is_first": True,
+    }
+
+    if copied:
+        media_type, media_file_id, media_caption = extract_media(message)
+
+        await TicketMessageCRUD.add_message_and_event(
             session=session,
             ticket_id=ticket.id,
             user_id=user.tg_id,
             message_text=message_text,
+            actor=Actor.CLIENT,
+            action="client_message",
+            event_payload=first_event,
             is_from_admin=False,
             media_type=media_type,
             media_file_id=media_file_id,
             media_caption=media_caption,
             telegram_message_id=sent_msg.message_id,
         )
+    else:
+        await TicketMessageCRUD.add_message_and_event(
+            session=session,
+            ticket_id=ticket.id,
+            user_id=user.tg_id,
+            message_text=message_text,
+            actor=Actor.CLIENT,
+            action="client_message",
+            event_payload=first_event,
+            is_from_admin=False,
+            telegram_message_id=sent_msg.message_id,
+        )
 
-    except TelegramBadRequest as e:
-        if "can't be copied" in str(e).lower():
-            text = message.text or message.caption or "[медиа]"
-            sent_msg = await bot.send_message(
-                chat_id=settings.main_group_id,
-                message_thread_id=topic_id,
-                text=f"Сообщение от клиента:\n\n{text}",
-            )
-
-            # Закрепляем
-            try:
-                await bot.pin_chat_message(
-                    chat_id=settings.main_group_id,
-                    message_id=sent_msg.message_id,
-                    disable_notification=True,
-                )
-            except Exception:
-                pass
-
-            await TicketMessageCRUD.add_message(
-                session=session,
-                ticket_id=ticket.id,
-                user_id=user.tg_id,
-                message_text=text,
-                is_from_admin=False,
-                telegram_message_id=sent_msg.message_id,
-            )
-        else:
-            logger.error(f"❌ Ошибка отправки первого сообщения: {e}")
-            raise
-
-
-    # Логируем как Event
-    await add_event(
-        session=session,
-        ticket_id=ticket.id,
-        actor=Actor.CLIENT,
-        action="client_message",
-        payload={
-            "telegram_message_id": message.message_id,
-            "chat_id": message.chat.id,
-            "text": message_text,
-            "is_first": True,
-        },
-    )
+    # Копия в тех-топике — отдельной записью, как раньше при автоназначении
+    if tech_msg is not None:
+        await TicketMessageCRUD.add_message(
+            session=session,
+            ticket_id=ticket.id,
+            user_id=user.tg_id,
+            message_text=message_text,
+            is_from_admin=False,
+            telegram_message_id=tech_msg.message_id,
+        )
 
 
 async def _forward_message_to_topic(
@@ -674,35 +753,28 @@ async def _forward_message_to_topic(
     ticket: Ticket,
     topic_id: int,
     message: Message,
+    tech_thread: TechThread | None = None,
 ) -> None:
     """
     Обычная пересылка сообщения клиента в его топик главной группы.
     Если назначен техник - дублируем в его группу.
     Сохраняем сообщение в БД.
+
+    tech_thread — тех-топик, уже загруженный вместе с тикетом
+    (тогда повторно его не ищем).
     """
 
     # Определяем медиа
-    media_type = None
-    media_file_id = None
-    media_caption = None
-
-    if message.photo:
-        media_type = "photo"
-        media_file_id = message.photo[-1].file_id
-        media_caption = message.caption
-    elif message.video:
-        media_type = "video"
-        media_file_id = message.video.file_id
-        media_caption = message.caption
-    elif message.document:
-        media_type = "document"
-        media_file_id = message.document.file_id
-        media_caption = message.caption
-    elif message.voice:
-        media_type = "voice"
-        media_file_id = message.voice.file_id
+    media_type, media_file_id, media_caption = extract_media(message)
 
     message_text = message.text or message.caption or "[медиа]"
+    event_payload = {
+        "telegram_message_id": message.message_id,
+        "chat_id": message.chat.id,
+        "text": message_text,
+        "is_first": False,
+    }
+    saved = False
 
     # Пересылаем в главную группу
     try:
@@ -716,18 +788,22 @@ async def _forward_message_to_topic(
             "✅ Сообщение переслано в главную группу (топик %s)", topic_id
         )
 
-        # Сохраняем в БД
-        await TicketMessageCRUD.add_message(
+        # Сохраняем в БД сообщение и событие одним flush
+        await TicketMessageCRUD.add_message_and_event(
             session=session,
             ticket_id=ticket.id,
             user_id=user.tg_id,
             message_text=message_text,
+            actor=Actor.CLIENT,
+            action="client_message",
+            event_payload=event_payload,
             is_from_admin=False,
             media_type=media_type,
             media_file_id=media_file_id,
             media_caption=media_caption,
             telegram_message_id=sent_msg.message_id,
         )
+        saved = True
 
     except TelegramBadRequest as e:
         if "can't be copied" in str(e).lower():
@@ -741,30 +817,30 @@ async def _forward_message_to_topic(
     except Exception as e:
         logger.error("❌ Ошибка пересылки в главную группу: %s", e)
 
-    # Если тикет не назначен — ничего больше не делаем
-    if not ticket.assigned_tech_id:
-        # Лог события только о пересылке в main (ниже тоже логируется)
+    # Сообщение не сохранилось — событие всё равно логируем
+    if not saved:
         await add_event(
             session=session,
             ticket_id=ticket.id,
             actor=Actor.CLIENT,
             action="client_message",
-            payload={
-                "telegram_message_id": message.message_id,
-                "chat_id": message.chat.id,
-                "text": message_text,
-                "is_first": False,
-            },
+            payload=event_payload,
         )
-        return
 
-    tech_thread = None
+    # Если тикет не назначен — ничего больше не делаем
+    if not ticket.assigned_tech_id:
+        return
 
     # Зеркалирование в группу техника
     if ticket.assigned_tech_id:
-        logger.debug(f"🔁 Попытка зеркалирования: ticket_id={ticket.id} assigned_tech_id={ticket.assigned_tech_id}")
-        # Пытаемся найти существующий тех-топик
-        tech_thread = await _get_tech_thread(session, ticket.id, ticket.assigned_tech_id)
+        logger.debug(
+            "🔁 Попытка зеркалирования: ticket_id=%s assigned_tech_id=%s",
+            ticket.id,
+            ticket.assigned_tech_id,
+        )
+        # Пытаемся найти существующий тех-топик (обычно уже пришёл с тикетом)
+        if tech_thread is None:
+            tech_thread = await _get_tech_thread(session, ticket.id, ticket.assigned_tech_id)
         logger.info("Нашли тех-топик: %s", tech_thread is not None)
         # Фоллбек: иногда TechThread создают по user_id (get_or_create_tech_thread),
         # поэтому попробуем найти по связке user_id + tech_id
@@ -806,20 +882,29 @@ async def _forward_message_to_topic(
                 logger.info("✅ Сообщение зеркалировано в группу техника (group=%s thread=%s)", tech_thread.tech_chat_id, tech_thread.tech_thread_id)
             except TelegramBadRequest as e:
                 if "can't be copied" in str(e).lower():
-                    logger.warning(f"⚠️ Сообщение {message.message_id} нельзя скопировать")
+                    logger.warning("⚠️ Сообщение %s нельзя скопировать", message.message_id)
                 else:
-                    logger.error(f"❌ Не удалось зеркалировать: {e}")
+                    logger.error("❌ Не удалось зеркалировать: %s", e)
             except Exception as e:
-                logger.error(f"❌ Не удалось зеркалировать: {e}")
+                logger.error("❌ Не удалось зеркалировать: %s", e)
         else:
-            logger.debug(f"ℹ️ TechThread не найден для ticket={ticket.id} tech={ticket.assigned_tech_id}; пропускаем зеркалирование")
+            logger.debug(
+                "ℹ️ TechThread не найден для ticket=%s tech=%s; пропускаем зеркалирование",
+                ticket.id,
+                ticket.assigned_tech_id,
+            )
 
     # Ленивая генерация тех-топика для автоназначенного техника
     if not tech_thread:
-        tech = await get_technician_by_id(
-            session=session,
-            tech_id=ticket.assigned_tech_id,
-        )
+        # Техник обычно уже загружен вместе с тикетом (_get_last_ticket_for_client)
+        tech = None
+        if "assigned_tech" not in sa_inspect(ticket).unloaded:
+            tech = ticket.assigned_tech
+        if tech is None or tech.id != ticket.assigned_tech_id:
+            tech = await get_technician_by_id(
+                session=session,
+                tech_id=ticket.assigned_tech_id,
+            )
         if not tech:
             logger.warning(
                 "❌ Автоназначенный техник не найден в БД: tech_id=%s ticket_id=%s",
@@ -836,117 +921,14 @@ async def _forward_message_to_topic(
             )
             return
 
-        # 👤 Формируем нормальное имя топика техника (как в main_group: без тега)
-        tech_topic_title = _build_main_topic_title_with_tech(
-            user=user,
-            status=ticket.status,
-            tech_tag=None,  # в топике техника тега нет
-        )
-
-        # Создаём новый топик в группе техника
-        try:
-            topic = await bot.create_forum_topic(
-                chat_id=tech.group_chat_id,
-                name=tech_topic_title,
-            )
-        except TelegramBadRequest as e:
-            logger.error(
-                "❌ Не удалось создать тех-топик для автоназначения: %s",
-                e,
-                exc_info=True,
-            )
-            return
-
-        # ✅ Создаём / получаем запись тех-топика в БД (без двойного insert)
-        tech_thread = await get_or_create_tech_thread(
+        await _bootstrap_tech_topic(
+            bot=bot,
             session=session,
-            ticket_id=ticket.id,
-            user_id=ticket.client_tg_id,
-            tech_id=tech.id,
-            tech_chat_id=tech.group_chat_id,
-            tech_thread_id=topic.message_thread_id,
-        )
-
-        logger.info(
-            "✅ Создан тех-топик по автоназначению: "
-            "ticket_id=%s tech_id=%s group=%s topic_id=%s",
-            ticket.id,
-            tech.id,
-            tech_thread.tech_chat_id,
-            tech_thread.tech_thread_id,
+            user=user,
+            ticket=ticket,
+            tech=tech,
         )
 
-        # 📋 Шапка клиента из таблицы — сразу в тех-топик
-        try:
-            sheet_data = await get_client_data_from_sheets(user.tg_id)
-            header_text = _build_client_header(user, sheet_data)
-
-            await bot.send_message(
-                chat_id=tech_thread.tech_chat_id,
-                message_thread_id=tech_thread.tech_thread_id,
-                text=header_text,
-                parse_mode="HTML",
-                disable_web_page_preview=True,
-            )
-            logger.info("✅ Шапка клиента отправлена в тех-топик (автоназначение)")
-        except Exception as e:
-            logger.error("❌ Ошибка отправки шапки клиента в тех-топик: %s", e)
-
-        # 🎛 Кнопки управления статусом заявки в тех-топик + пин
-        try:
-            status_kb = InlineKeyboardMarkup(
-                inline_keyboard=[[
-                    InlineKeyboardButton(
-                        text="🟡 В работе",
-                        callback_data=f"status_work:{ticket.id}",
-                    ),
-                    InlineKeyboardButton(
-                        text="⚪️ Закрыть",
-                        callback_data=f"status_close:{ticket.id}",
-                    ),
-                ]]
-            )
-            status_msg = await bot.send_message(
-                chat_id=tech_thread.tech_chat_id,
-                message_thread_id=tech_thread.tech_thread_id,
-                text="🎛 <b>Управление статусом:</b>",
-                reply_markup=status_kb,
-                parse_mode="HTML",
-            )
-            try:
-                await bot.pin_chat_message(
-                    chat_id=tech_thread.tech_chat_id,
-                    message_id=status_msg.message_id,
-                    disable_notification=True,
-                )
-                logger.info("📌 Кнопки статусов закреплены в тех-топике (автоназначение)")
-            except Exception as e:
-                logger.warning(
-                    "⚠️ Не удалось закрепить кнопки статусов в тех-топике: %s",
-                    e,
-                )
-        except Exception as e:
-            logger.error(
-                "❌ Ошибка отправки кнопок статусов в тех-топик: %s",
-                e,
-            )
-
-
-
-    # Логируем событие
-    await add_event(
-        session=session,
-        ticket_id=ticket.id,
-        actor=Actor.CLIENT,
-        action="client_message",
-        payload={
-            "telegram_message_id": message.message_id,
-            "chat_id": message.chat.id,
-            "text": message_text,
-            "is_first": False,
-        },
-    )
-
 
 # ─────────────────────────────────────────────
 #  Хэндлер для user-bot
@@ -955,7 +937,6 @@ async def _forward_message_to_topic(
 async def handle_any_user_message(
     message: Message,
     bot: Bot,
-    state: FSMContext,
 ) -> None:
     """
     Любое сообщение от пользователя в личке бота.
@@ -972,20 +953,11 @@ async def handle_any_user_message(
       5) Если тикет не новый и не закрыт:
          • просто пересылаем сообщение в его топик.
     """
-    if not message.from_user:
-        return
-
-    # 🔒 Админов здесь игнорируем, чтобы для них не создавались тикеты/топики
-    if settings.is_admin(message.from_user.id):
-        # Можно вообще молча игнорить, либо что-то ответить:
-        # await message.answer("Это пользовательский бот поддержки, для работы админа используйте группу.")
-        return
-
-    current_state = await state.get_state()
-    if current_state is not None:
-        return
-
-    async with db_manager.session() as db:  # 🔹 сами берём AsyncSession
+    # Админов, сообщения без from_user и пользователей в FSM-состоянии
+    # отсекают фильтры при регистрации (_is_client, StateFilter(None))
+    # 🔹 Одна транзакция на сообщение: CRUD внутри делает только flush,
+    # единственный COMMIT — при выходе из db_manager.session()
+    async with db_manager.session() as db:
         # 1) юзер в БД
         user = await get_or_create_user(
             db,
@@ -996,7 +968,7 @@ async def handle_any_user_message(
         )
 
         # 2) тикет + топик
-        ticket, topic_id, is_new_ticket = await _ensure_topic_and_ticket(
+        ticket, topic_id, is_new_ticket, tech_thread = await _ensure_topic_and_ticket(
             message=message,
             bot=bot,
             session=db,
@@ -1012,6 +984,7 @@ async def handle_any_user_message(
                 ticket=ticket,
                 topic_id=topic_id,
                 message=message,
+                tech_thread=tech_thread,
             )
         else:
             if ticket.status == TicketStatus.CLOSED:
@@ -1026,9 +999,20 @@ async def handle_any_user_message(
                 ticket=ticket,
                 topic_id=topic_id,
                 message=message,
+                tech_thread=tech_thread,
             )
 
 
+def _is_client(message: Message) -> bool:
+    """
+    Фильтр: сообщение от клиента, а не от админа.
+
+    🔒 Для админов тикеты/топики не создаём; проверка на уровне фильтра,
+    чтобы их апдейты вообще не доходили до хэндлера.
+    """
+    return message.from_user is not None and not settings.is_admin(message.from_user.id)
+
+
 def register_handlers(dp: Dispatcher) -> None:
     """
     Регистрация обработчиков для пользовательского бота.
@@ -1037,5 +1021,7 @@ def register_handlers(dp: Dispatcher) -> None:
     dp.message.register(
         handle_any_user_message,
         F.chat.type == ChatType.PRIVATE,
-        # StateFilter(None),
+        _is_client,
+        # состояние уже прочитано FSM-middleware — без лишнего GET в хранилище
+        StateFilter(None),
     )
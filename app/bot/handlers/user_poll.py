@@ -5,19 +5,40 @@
 """
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
 from aiogram import Dispatcher, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.enums import ChatType
+from aiogram.filters.callback_data import CallbackData
+from sqlalchemy.exc import IntegrityError
 
 from app.db.database import db_manager
-from app.db.crud.ticket import create_feedback
+from app.db.crud.ticket import create_feedbacks_bulk
+from app.utils.background import run_in_background
 from app.utils.cache import cache
+from app.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Отзывы копятся в очереди и пишутся в БД пачками одним INSERT
+FEEDBACK_BATCH_SIZE = 100
+FEEDBACK_FLUSH_INTERVAL = 0.2   # сколько ждать добора пачки, сек
+FEEDBACK_FLUSH_TIMEOUT = 5.0    # сколько ждать сброса очереди при остановке
+FEEDBACK_MAX_ATTEMPTS = 3       # попыток записи строки при временных ошибках БД
+FEEDBACK_RETRY_DELAY = 1.0      # пауза перед возвратом строк в очередь, сек
+
+# Элемент очереди: (строка Feedback, сколько попыток записи уже было)
+_feedback_queue: asyncio.Queue[tuple[dict, int]] = asyncio.Queue()
+_feedback_flusher: asyncio.Task | None = None
+
+# Локальная копия ticket_info (user_id → dict): за опрос 5 нажатий, в Redis
+# идём только за первым. TTL короче, чем у ключа в Redis
+_ticket_info_local: TTLCache[int, dict] = TTLCache(maxsize=10000, ttl=600)
+
 
 # ─────────────────────────────────────────────
 #  FSM Состояния
@@ -33,6 +54,16 @@ class FeedbackStates(StatesGroup):
     waiting_comment = State()
 
 
+# ─────────────────────────────────────────────
+#  Callback data
+# ─────────────────────────────────────────────
+
+class PollRate(CallbackData, prefix="poll_rate"):
+    """callback_data оценки: poll_rate:<номер вопроса>:<оценка>."""
+    question_num: int
+    rating: int
+
+
 # ─────────────────────────────────────────────
 #  Тексты вопросов
 # ─────────────────────────────────────────────
@@ -45,12 +76,46 @@ QUESTIONS = {
     5: "Насколько вам понравилось, как специалист объяснил стоимость работ и деталей?",
 }
 
+# Готовые тексты сообщений с вопросами (номер → HTML)
+QUESTION_PROMPTS = {
+    n: (
+        "📊 <b>Оценка работы поддержки</b>\n\n"
+        f"<b>Вопрос {n}/{len(QUESTIONS)}</b>\n\n"
+        f"{text}"
+    )
+    for n, text in QUESTIONS.items()
+}
+
+
+# ─────────────────────────────────────────────
+#  Тексты сообщений
+# ─────────────────────────────────────────────
+
+ASK_COMMENT_TEXT = (
+    "✅ <b>Спасибо за ваши оценки!</b>\n\n"
+    "Хотите оставить комментарий или пожелание?\n\n"
+    "Напишите его в следующем сообщении или нажмите "
+    "<b>«Пропустить комментарий»</b>."
+)
+THANKS_TEXT = (
+    "✅ <b>Спасибо за обратную связь!</b>\n\n"
+    "Ваша оценка помогает нам становиться лучше! 🌟"
+)
+THANKS_WITH_COMMENT_TEXT = (
+    "✅ <b>Спасибо за обратную связь!</b>\n\n"
+    "Ваша оценка и комментарий помогают нам становиться лучше! 🌟"
+)
+DECLINED_TEXT = "Вы отказались от опроса. Спасибо за обращение в поддержку! 👋"
+SESSION_EXPIRED_TEXT = "❌ Сессия опроса истекла. Пожалуйста, начните заново."
+NO_POLL_DATA_TEXT = "❌ Ошибка: данные опроса не найдены."
+NOT_ALL_ANSWERED_TEXT = "❌ Ошибка: не все вопросы отвечены."
+
 
 # ─────────────────────────────────────────────
 #  Клавиатуры
 # ─────────────────────────────────────────────
 
-def _get_rating_keyboard(question_num: int) -> InlineKeyboardMarkup:
+def _build_rating_keyboard(question_num: int) -> InlineKeyboardMarkup:
     """
     Клавиатура для оценки (1-5 звезд + кнопка отказа).
 
@@ -64,41 +129,18 @@ def _get_rating_keyboard(question_num: int) -> InlineKeyboardMarkup:
 
     return InlineKeyboardMarkup(
         inline_keyboard=[
-            # Ряд 1: 1 звезда
-            [
-                InlineKeyboardButton(
-                    text=f"{stars[0]} 1",
-                    callback_data=f"poll_rate:{question_num}:1"
-                ),
-            ],
-            # Ряд 2: 2 звезды
-            [
-                InlineKeyboardButton(
-                    text=f"{stars[1]} 2",
-                    callback_data=f"poll_rate:{question_num}:2"
-                ),
-            ],
-            # Ряд 3: 3 звезды
-            [
-                InlineKeyboardButton(
-                    text=f"{stars[2]} 3",
-                    callback_data=f"poll_rate:{question_num}:3"
-                ),
-            ],
-            # Ряд 4: 4 звезды
-            [
-                InlineKeyboardButton(
-                    text=f"{stars[3]} 4",
-                    callback_data=f"poll_rate:{question_num}:4"
-                ),
-            ],
-            # Ряд 5: 5 звезд
-            [
-                InlineKeyboardButton(
-                    text=f"{stars[4]} 5",
-                    callback_data=f"poll_rate:{question_num}:5"
-                ),
-            ],
+            # Ряды 1-5: от 1 до 5 звезд
+            *(
+                [
+                    InlineKeyboardButton(
+                        text=f"{stars[rating - 1]} {rating}",
+                        callback_data=PollRate(
+                            question_num=question_num, rating=rating
+                        ).pack()
+                    ),
+                ]
+                for rating in range(1, 6)
+            ),
             # Ряд 6: отказаться
             [
                 InlineKeyboardButton(
@@ -110,7 +152,7 @@ def _get_rating_keyboard(question_num: int) -> InlineKeyboardMarkup:
     )
 
 
-def _get_comment_keyboard() -> InlineKeyboardMarkup:
+def _build_comment_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для этапа комментария."""
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -130,10 +172,65 @@ def _get_comment_keyboard() -> InlineKeyboardMarkup:
     )
 
 
+# Клавиатуры не зависят от пользователя — собираем один раз при импорте
+_RATING_KBS: dict[int, InlineKeyboardMarkup] = {
+    n: _build_rating_keyboard(n) for n in QUESTIONS
+}
+_COMMENT_KB = _build_comment_keyboard()
+
+
+def _get_rating_keyboard(question_num: int) -> InlineKeyboardMarkup:
+    """Готовая клавиатура оценок для вопроса question_num (1-5)."""
+    return _RATING_KBS[question_num]
+
+
+def _get_comment_keyboard() -> InlineKeyboardMarkup:
+    """Готовая клавиатура для этапа комментария."""
+    return _COMMENT_KB
+
+
 # ─────────────────────────────────────────────
 #  Вспомогательные функции
 # ─────────────────────────────────────────────
 
+def _answers_key(user_id: int, ticket_id: int) -> str:
+    """Ключ хеша с ответами опроса (поля q1..q5)."""
+    return f"poll:{user_id}:{ticket_id}:answers"
+
+
+def _ticket_info_key(user_id: int) -> str:
+    """Ключ с тикетом, по которому идёт опрос клиента."""
+    return f"poll:{user_id}:ticket_info"
+
+
+async def _get_ticket_info_from_cache(user_id: int) -> dict | None:
+    """Получить информацию о тикете (сначала из памяти процесса, потом из Redis)."""
+    ticket_info = _ticket_info_local.get(user_id)
+    if ticket_info is not None:
+        return ticket_info
+
+    ticket_info = await cache.get(_ticket_info_key(user_id))
+    if ticket_info:
+        _ticket_info_local.set(user_id, ticket_info)
+    return ticket_info
+
+
+async def _save_ticket_info_to_cache(
+    user_id: int,
+    ticket_id: int,
+    tech_id: int | None
+) -> bool:
+    """
+    Сохранить информацию о тикете в кеш на 1 час.
+
+    Отдельный ключ, а не данные FSM: у FSM-хранилища нет TTL, и /start
+    (state.clear()) стёр бы идущий опрос.
+    """
+    data = {"ticket_id": ticket_id, "tech_id": tech_id}
+    _ticket_info_local.set(user_id, data)
+    return await cache.set(_ticket_info_key(user_id), data, expire=3600)
+
+
 async def _save_answer_to_cache(
     user_id: int,
     ticket_id: int,
@@ -152,8 +249,14 @@ async def _save_answer_to_cache(
     Returns:
         True если успешно
     """
-    cache_key = f"poll:{user_id}:{ticket_id}:q{question_num}"
-    return await cache.set(cache_key, rating, expire=3600)  # 1 час
+    # TTL обновляем на каждом ответе (HSET + EXPIRE одним pipeline): если хеш
+    # успел истечь, HSET создал бы новый ключ без TTL, который никто не удалит
+    return await cache.hset(
+        _answers_key(user_id, ticket_id),
+        f"q{question_num}",
+        rating,
+        expire=3600,  # 1 час
+    )
 
 
 async def _get_answers_from_cache(
@@ -161,7 +264,7 @@ async def _get_answers_from_cache(
     ticket_id: int
 ) -> dict[str, int]:
     """
-    Получить все ответы из кеша.
+    Получить все ответы из кеша (один HGETALL).
 
     Args:
         user_id: ID пользователя
@@ -170,37 +273,27 @@ async def _get_answers_from_cache(
     Returns:
         Словарь с ответами {q1: rating, q2: rating, ...}
     """
-    answers = {}
-    for i in range(1, 6):
-        cache_key = f"poll:{user_id}:{ticket_id}:q{i}"
-        rating = await cache.get(cache_key)
-        if rating is not None:
-            answers[f"q{i}"] = int(rating)
-    return answers
+    raw = await cache.hgetall(_answers_key(user_id, ticket_id))
+    return {field: int(rating) for field, rating in raw.items()}
 
 
 async def _clear_poll_cache(user_id: int, ticket_id: int) -> None:
-    """Очистить кеш опроса."""
-    for i in range(1, 6):
-        cache_key = f"poll:{user_id}:{ticket_id}:q{i}"
-        await cache.delete(cache_key)
+    """Очистить кеш опроса вместе с информацией о тикете (один DEL)."""
+    await cache.delete(_answers_key(user_id, ticket_id), _ticket_info_key(user_id))
 
 
-async def _get_ticket_info_from_cache(user_id: int) -> dict | None:
-    """Получить информацию о тикете из кеша."""
-    cache_key = f"poll:{user_id}:ticket_info"
-    return await cache.get(cache_key)
-
+async def _end_poll(state: FSMContext, user_id: int, ticket_id: int | None) -> None:
+    """
+    Сбросить ответы в кеше и FSM опроса.
 
-async def _save_ticket_info_to_cache(
-    user_id: int,
-    ticket_id: int,
-    tech_id: int | None
-) -> bool:
-    """Сохранить информацию о тикете в кеш."""
-    cache_key = f"poll:{user_id}:ticket_info"
-    data = {"ticket_id": ticket_id, "tech_id": tech_id}
-    return await cache.set(cache_key, data, expire=3600)
+    Кеш и FSM-хранилище — разные Redis-клиенты, общий pipeline не собрать,
+    поэтому запросы просто идут параллельно.
+    """
+    _ticket_info_local.pop(user_id)
+    if ticket_id:
+        await asyncio.gather(state.clear(), _clear_poll_cache(user_id, ticket_id))
+    else:
+        await state.clear()
 
 
 # ─────────────────────────────────────────────
@@ -223,47 +316,45 @@ async def start_feedback_poll(
         tech_id: ID техника (может быть None)
     """
     try:
-        # Сохраняем информацию о тикете в кеш
+        # Информацию о тикете кладём в кеш (состояние FSM не ставим,
+        # чтобы обычные сообщения клиента продолжали уходить в поддержку)
         await _save_ticket_info_to_cache(user_id, ticket_id, tech_id)
 
         # Отправляем первый вопрос
-        text = (
-            "📊 <b>Оценка работы поддержки</b>\n\n"
-            f"<b>Вопрос 1/5</b>\n\n"
-            f"{QUESTIONS[1]}"
-        )
-
         await bot.send_message(
             chat_id=user_id,
-            text=text,
+            text=QUESTION_PROMPTS[1],
             reply_markup=_get_rating_keyboard(1),
             parse_mode="HTML"
         )
 
-        logger.info(f"✅ Опрос инициирован для пользователя {user_id}, тикет #{ticket_id}")
+        logger.info("✅ Опрос инициирован для пользователя %s, тикет #%s", user_id, ticket_id)
 
     except Exception as e:
-        logger.error(f"❌ Ошибка инициации опроса: {e}")
+        logger.error("❌ Ошибка инициации опроса: %s", e)
 
 
 # ─────────────────────────────────────────────
 #  Обработчики ответов
 # ─────────────────────────────────────────────
 
-async def handle_rating(call: CallbackQuery, state: FSMContext, bot: Bot) -> None:
+async def handle_rating(
+    call: CallbackQuery,
+    callback_data: PollRate,
+    state: FSMContext,
+) -> None:
     """Обработка оценки по вопросу."""
     try:
-        # Парсим callback_data: poll_rate:question_num:rating
-        _, question_str, rating_str = call.data.split(":")
-        question_num = int(question_str)
-        rating = int(rating_str)
+        # callback_data уже разобран фильтром PollRate.filter()
+        question_num = callback_data.question_num
+        rating = callback_data.rating
 
-        # Получаем информацию о тикете
+        # Информация о тикете — в кеше (кладёт start_feedback_poll)
         ticket_info = await _get_ticket_info_from_cache(call.from_user.id)
 
         if not ticket_info:
             await call.message.edit_text(
-                "❌ Сессия опроса истекла. Пожалуйста, начните заново.",
+                SESSION_EXPIRED_TEXT,
                 reply_markup=None
             )
             await call.answer()
@@ -280,35 +371,22 @@ async def handle_rating(call: CallbackQuery, state: FSMContext, bot: Bot) -> Non
         )
 
         logger.info(
-            f"📝 Ответ на вопрос {question_num}: {rating} "
-            f"(пользователь {call.from_user.id}, тикет #{ticket_id})"
+            "📝 Ответ на вопрос %s: %s (пользователь %s, тикет #%s)",
+            question_num, rating, call.from_user.id, ticket_id,
         )
 
         # Переходим к следующему вопросу или к комментарию
         if question_num < 5:
             next_question = question_num + 1
-            text = (
-                "📊 <b>Оценка работы поддержки</b>\n\n"
-                f"<b>Вопрос {next_question}/5</b>\n\n"
-                f"{QUESTIONS[next_question]}"
-            )
-
             await call.message.edit_text(
-                text=text,
+                text=QUESTION_PROMPTS[next_question],
                 reply_markup=_get_rating_keyboard(next_question),
                 parse_mode="HTML"
             )
         else:
             # Все 5 вопросов пройдены - предлагаем комментарий
-            text = (
-                "✅ <b>Спасибо за ваши оценки!</b>\n\n"
-                "Хотите оставить комментарий или пожелание?\n\n"
-                "Напишите его в следующем сообщении или нажмите "
-                "<b>«Пропустить комментарий»</b>."
-            )
-
             await call.message.edit_text(
-                text=text,
+                text=ASK_COMMENT_TEXT,
                 reply_markup=_get_comment_keyboard(),
                 parse_mode="HTML"
             )
@@ -325,43 +403,43 @@ async def handle_rating(call: CallbackQuery, state: FSMContext, bot: Bot) -> Non
         await call.answer()
 
     except Exception as e:
-        logger.error(f"❌ Ошибка обработки оценки: {e}")
+        logger.error("❌ Ошибка обработки оценки: %s", e)
         await call.answer("❌ Произошла ошибка", show_alert=True)
 
 
+async def _remove_poll_message(call: CallbackQuery) -> None:
+    """🔹 Удалить сообщение с опросом (если нельзя — отредактировать)."""
+    try:
+        await call.message.delete()
+        logger.info("✅ Сообщение опроса удалено для пользователя %s", call.from_user.id)
+    except Exception as e:
+        logger.warning("⚠️ Не удалось удалить сообщение опроса: %s", e)
+        # Если не удалось удалить - редактируем
+        await call.message.edit_text(
+            DECLINED_TEXT,
+            reply_markup=None
+        )
+
+
 async def handle_decline(call: CallbackQuery, state: FSMContext) -> None:
     """Обработка отказа от опроса - немедленное закрытие."""
     try:
         # Получаем информацию о тикете
         ticket_info = await _get_ticket_info_from_cache(call.from_user.id)
+        ticket_id = ticket_info["ticket_id"] if ticket_info else None
 
-        if ticket_info:
-            # Очищаем кеш
-            await _clear_poll_cache(call.from_user.id, ticket_info["ticket_id"])
-            cache_key = f"poll:{call.from_user.id}:ticket_info"
-            await cache.delete(cache_key)
-
-        # Очищаем состояние
-        await state.clear()
-
-        # 🔹 УДАЛЯЕМ сообщение с опросом
-        try:
-            await call.message.delete()
-            logger.info(f"✅ Сообщение опроса удалено для пользователя {call.from_user.id}")
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось удалить сообщение опроса: {e}")
-            # Если не удалось удалить - редактируем
-            await call.message.edit_text(
-                "Вы отказались от опроса. Спасибо за обращение в поддержку! 👋",
-                reply_markup=None
-            )
+        # Очищаем кеш и состояние, параллельно убираем сообщение с опросом
+        await asyncio.gather(
+            _end_poll(state, call.from_user.id, ticket_id),
+            _remove_poll_message(call),
+        )
 
-        logger.info(f"ℹ️ Пользователь {call.from_user.id} отказался от опроса")
+        logger.info("ℹ️ Пользователь %s отказался от опроса", call.from_user.id)
 
         await call.answer("Опрос отменен")
 
     except Exception as e:
-        logger.error(f"❌ Ошибка обработки отказа: {e}")
+        logger.error("❌ Ошибка обработки отказа: %s", e)
         await call.answer()
 
 
@@ -375,7 +453,7 @@ async def handle_skip_comment(call: CallbackQuery, state: FSMContext) -> None:
 
         if not ticket_id:
             await call.message.edit_text(
-                "❌ Ошибка: данные опроса не найдены.",
+                NO_POLL_DATA_TEXT,
                 reply_markup=None
             )
             await call.answer()
@@ -386,7 +464,7 @@ async def handle_skip_comment(call: CallbackQuery, state: FSMContext) -> None:
 
         if len(answers) != 5:
             await call.message.edit_text(
-                "❌ Ошибка: не все вопросы отвечены.",
+                NOT_ALL_ANSWERED_TEXT,
                 reply_markup=None
             )
             await call.answer()
@@ -400,28 +478,43 @@ async def handle_skip_comment(call: CallbackQuery, state: FSMContext) -> None:
             comment=None
         )
 
-        # Очищаем кеш и состояние
-        await _clear_poll_cache(call.from_user.id, ticket_id)
-        cache_key = f"poll:{call.from_user.id}:ticket_info"
-        await cache.delete(cache_key)
-        await state.clear()
-
-        await call.message.edit_text(
-            "✅ <b>Спасибо за обратную связь!</b>\n\n"
-            "Ваша оценка помогает нам становиться лучше! 🌟",
-            reply_markup=None,
-            parse_mode="HTML"
+        # Очищаем кеш и состояние параллельно с ответом клиенту
+        await asyncio.gather(
+            _end_poll(state, call.from_user.id, ticket_id),
+            call.message.edit_text(
+                THANKS_TEXT,
+                reply_markup=None,
+                parse_mode="HTML"
+            ),
+            call.answer(),
         )
 
-        logger.info(f"✅ Опрос завершен без комментария (тикет #{ticket_id})")
-
-        await call.answer()
+        logger.info("✅ Опрос завершен без комментария (тикет #%s)", ticket_id)
 
     except Exception as e:
-        logger.error(f"❌ Ошибка сохранения опроса: {e}")
+        logger.error("❌ Ошибка сохранения опроса: %s", e)
         await call.answer("❌ Произошла ошибка", show_alert=True)
 
 
+async def _safe_delete(
+    bot: Bot,
+    chat_id: int,
+    message_id: int,
+    what: str,
+    fail_level: int = logging.DEBUG,
+) -> None:
+    """Удалить сообщение, не пробрасывая ошибку (только лог)."""
+    try:
+        await bot.delete_message(chat_id=chat_id, message_id=message_id)
+        logger.info("✅ Удалено %s %s в чате %s", what, message_id, chat_id)
+    except Exception as e:
+        logger.log(
+            fail_level,
+            "⚠️ Не удалось удалить %s %s в чате %s: %s",
+            what, message_id, chat_id, e,
+        )
+
+
 async def handle_comment(message: Message, state: FSMContext, bot: Bot) -> None:
     """Обработка комментария."""
     try:
@@ -437,14 +530,14 @@ async def handle_comment(message: Message, state: FSMContext, bot: Bot) -> None:
         poll_message_id = data.get("poll_message_id")  # 🆕 id сообщения с опросом
 
         if not ticket_id:
-            await message.answer("❌ Ошибка: данные опроса не найдены.")
+            await message.answer(NO_POLL_DATA_TEXT)
             return
 
         # Получаем ответы из кеша
         answers = await _get_answers_from_cache(message.from_user.id, ticket_id)
 
         if len(answers) != 5:
-            await message.answer("❌ Ошибка: не все вопросы отвечены.")
+            await message.answer(NOT_ALL_ANSWERED_TEXT)
             return
 
         # Получаем комментарий (ограничиваем 500 символов)
@@ -458,61 +551,32 @@ async def handle_comment(message: Message, state: FSMContext, bot: Bot) -> None:
             comment=comment
         )
 
-        # Очищаем кеш и состояние
-        await _clear_poll_cache(message.from_user.id, ticket_id)
-        cache_key = f"poll:{message.from_user.id}:ticket_info"
-        await cache.delete(cache_key)
-        await state.clear()
+        chat_id = message.chat.id
 
-        # 🧹 Пытаемся удалить сообщение с опросом/кнопками
+        # 🧹 Удаление опроса и комментария — best-effort, ответ клиенту его не ждёт
         if poll_message_id:
-            try:
-                await bot.delete_message(
-                    chat_id=message.chat.id,
-                    message_id=poll_message_id,
-                )
-                logger.info(
-                    f"✅ Сообщение опроса {poll_message_id} удалено "
-                    f"в чате {message.chat.id}"
-                )
-            except Exception as e:
-                logger.warning(
-                    f"⚠️ Не удалось удалить сообщение опроса "
-                    f"{poll_message_id} в чате {message.chat.id}: {e}"
-                )
-
-        # 🧹 Пытаемся удалить комментарий пользователя
-        # В приватном чате Telegram, скорее всего, не даст удалить — будет тихий фейл.
-        try:
-            await bot.delete_message(
-                chat_id=message.chat.id,
-                message_id=message.message_id,
-            )
-            logger.info(
-                f"✅ Сообщение с комментарием пользователя "
-                f"{message.message_id} удалено в чате {message.chat.id}"
-            )
-        except Exception as e:
-            # В ЛС это нормально — бот не имеет права удалять сообщения пользователя.
-            logger.debug(
-                f"ℹ️ Не удалось удалить комментарий пользователя "
-                f"{message.message_id} в чате {message.chat.id}: {e}"
+            run_in_background(
+                _safe_delete(bot, chat_id, poll_message_id, "сообщение опроса", logging.WARNING)
             )
+        # В ЛС Telegram, скорее всего, не даст удалить сообщение пользователя — это нормально
+        run_in_background(
+            _safe_delete(bot, chat_id, message.message_id, "комментарий пользователя")
+        )
 
-        # Отправляем финальное сообщение "Спасибо..."
-        await bot.send_message(
-            chat_id=message.chat.id,
-            text=(
-                "✅ <b>Спасибо за обратную связь!</b>\n\n"
-                "Ваша оценка и комментарий помогают нам становиться лучше! 🌟"
+        # Очищаем кеш и состояние параллельно с финальным "Спасибо..."
+        await asyncio.gather(
+            _end_poll(state, message.from_user.id, ticket_id),
+            bot.send_message(
+                chat_id=chat_id,
+                text=THANKS_WITH_COMMENT_TEXT,
+                parse_mode="HTML",
             ),
-            parse_mode="HTML",
         )
 
-        logger.info(f"✅ Опрос завершен с комментарием (тикет #{ticket_id})")
+        logger.info("✅ Опрос завершен с комментарием (тикет #%s)", ticket_id)
 
     except Exception as e:
-        logger.error(f"❌ Ошибка обработки комментария: {e}")
+        logger.error("❌ Ошибка обработки комментария: %s", e)
         await message.answer("❌ Произошла ошибка при сохранении комментария.")
 
 
@@ -523,29 +587,130 @@ async def _save_feedback_to_db(
     answers: dict[str, int],
     comment: str | None
 ) -> None:
-    """Сохранить отзыв в базу данных."""
-    async with db_manager.session() as db:
+    """
+    Поставить отзыв в очередь на запись в БД.
+
+    Запись делает фоновая задача пачками (см. _feedback_flush_loop).
+    Ошибки INSERT здесь не всплывают: строка повторяется отдельно, а если
+    записать её так и не удалось — payload уходит в лог (_dead_letter_feedback).
+    """
+    global _feedback_flusher
+
+    row = {
+        "ticket_id": ticket_id,
+        "tech_id": tech_id,
+        "q1": answers.get("q1", 0),
+        "q2": answers.get("q2", 0),
+        "q3": answers.get("q3", 0),
+        "q4": answers.get("q4", 0),
+        "q5": answers.get("q5", 0),
+        "comment": comment,
+    }
+    _feedback_queue.put_nowait((row, 0))
+
+    if _feedback_flusher is None or _feedback_flusher.done():
+        _feedback_flusher = asyncio.create_task(_feedback_flush_loop())
+
+
+async def _feedback_flush_loop() -> None:
+    """Фоновая запись отзывов: до FEEDBACK_BATCH_SIZE строк или FEEDBACK_FLUSH_INTERVAL сек."""
+    loop = asyncio.get_running_loop()
+
+    while True:
+        batch = [await _feedback_queue.get()]
+        deadline = loop.time() + FEEDBACK_FLUSH_INTERVAL
+
+        while len(batch) < FEEDBACK_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_feedback_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
         try:
-            await create_feedback(
-                session=db,
-                ticket_id=ticket_id,
-                tech_id=tech_id,
-                q1=answers.get("q1", 0),
-                q2=answers.get("q2", 0),
-                q3=answers.get("q3", 0),
-                q4=answers.get("q4", 0),
-                q5=answers.get("q5", 0),
-                comment=comment
-            )
+            await _write_feedback_batch(batch)
+        finally:
+            for _ in batch:
+                _feedback_queue.task_done()
+
+
+async def _write_feedback_batch(batch: list[tuple[dict, int]]) -> None:
+    """
+    Записать пачку отзывов одним INSERT.
 
+    Если пачка не записалась, строки пишутся по одной, чтобы одна плохая
+    строка (например, нарушение FK) не потянула за собой остальные.
+    Нарушение ограничений не повторяем; прочие ошибки — до FEEDBACK_MAX_ATTEMPTS
+    раз через очередь. Неудавшиеся строки попадают в лог целиком.
+    """
+    try:
+        async with db_manager.session() as db:
+            await create_feedbacks_bulk(session=db, rows=[row for row, _ in batch])
+    except Exception as e:
+        logger.warning(
+            "⚠️ Пачка из %d отзывов не записалась (%s), пишем по одному", len(batch), e
+        )
+    else:
+        if logger.isEnabledFor(logging.INFO):
             logger.info(
-                f"💾 Отзыв сохранен в БД: тикет #{ticket_id}, "
-                f"оценки: {answers}, комментарий: {'да' if comment else 'нет'}"
+                "💾 Отзывы сохранены в БД: %d шт. (тикеты: %s)",
+                len(batch), ", ".join(f"#{row['ticket_id']}" for row, _ in batch),
             )
+        return
 
+    retry: list[tuple[dict, int]] = []
+    for row, attempts in batch:
+        try:
+            async with db_manager.session() as db:
+                await create_feedbacks_bulk(session=db, rows=[row])
+        except IntegrityError as e:
+            _dead_letter_feedback(row, e)
         except Exception as e:
-            logger.error(f"❌ Ошибка сохранения отзыва в БД: {e}")
-            raise
+            if attempts + 1 >= FEEDBACK_MAX_ATTEMPTS:
+                _dead_letter_feedback(row, e)
+            else:
+                retry.append((row, attempts + 1))
+        else:
+            logger.info("💾 Отзыв по тикету #%s сохранён в БД", row["ticket_id"])
+
+    if retry:
+        logger.warning("🔁 %d отзывов вернутся в очередь на повтор", len(retry))
+        await asyncio.sleep(FEEDBACK_RETRY_DELAY)
+        for item in retry:
+            _feedback_queue.put_nowait(item)
+
+
+def _dead_letter_feedback(row: dict, error: Exception) -> None:
+    """Отзыв, который не удалось записать: полный payload в лог для ручного повтора."""
+    logger.error(
+        "💀 Отзыв по тикету #%s не сохранён в БД (%s), payload: %s",
+        row["ticket_id"],
+        error,
+        json.dumps(row, ensure_ascii=False),
+    )
+
+
+async def flush_feedback_queue() -> None:
+    """Дописать накопленные отзывы в БД (вызывается при остановке бота)."""
+    global _feedback_flusher
+
+    if _feedback_flusher is None:
+        return
+
+    try:
+        await asyncio.wait_for(_feedback_queue.join(), timeout=FEEDBACK_FLUSH_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(
+            "⚠️ Очередь отзывов не сброшена, не записано: %d", _feedback_queue.qsize()
+        )
+        while not _feedback_queue.empty():
+            row, _ = _feedback_queue.get_nowait()
+            _dead_letter_feedback(row, asyncio.TimeoutError("остановка бота"))
+            _feedback_queue.task_done()
+    _feedback_flusher.cancel()
+    _feedback_flusher = None
 
 
 # ─────────────────────────────────────────────
@@ -558,7 +723,7 @@ def register_handlers(dp: Dispatcher) -> None:
     # Обработка оценок
     dp.callback_query.register(
         handle_rating,
-        F.data.startswith("poll_rate:"),
+        PollRate.filter(),
         F.message.chat.type == ChatType.PRIVATE,
     )
 
@@ -1,14 +1,17 @@
 # app/bot/keyboards/admin_kb.py
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import Sequence
 
-from aiogram.types import InlineKeyboardMarkup
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from app.db.models import Technician
 
 
+# Клавиатура без параметров — собираем один раз
+@lru_cache(maxsize=1)
 def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     """Главное меню для админа."""
     builder = InlineKeyboardBuilder()
@@ -26,34 +29,28 @@ def get_main_menu_keyboard() -> InlineKeyboardMarkup:
 def get_technicians_menu_keyboard(
     technicians: Sequence[Technician],
 ) -> InlineKeyboardMarkup:
-    """Клавиатура управления техниками."""
-    builder = InlineKeyboardBuilder()
+    """
+    Клавиатура управления техниками.
 
+    Все кнопки по одной в строке, поэтому ряды собираем сразу,
+    без InlineKeyboardBuilder и adjust().
+    """
     # 1) Кнопка "Добавить техника"
-    builder.button(
-        text="➕ Добавить техника",
-        callback_data="admin_add_tech",
-    )
+    rows = [[InlineKeyboardButton(text="➕ Добавить техника", callback_data="admin_add_tech")]]
 
     # 2) Список техников
-    for tech in technicians:
-        builder.button(
-            text=tech.name,
-            callback_data=f"admin_tech:{tech.id}",
-        )
+    rows += [
+        [InlineKeyboardButton(text=tech.name, callback_data=f"admin_tech:{tech.id}")]
+        for tech in technicians
+    ]
 
     # 3) Кнопка "Назад"
-    builder.button(
-        text="⬅️ Назад",
-        callback_data="admin_back_to_menu",
-    )
+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_back_to_menu")])
 
-    # Всё по одному в строке
-    builder.adjust(1)
-
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=1)
 def get_add_tech_method_keyboard() -> InlineKeyboardMarkup:
     """Выбор способа добавления техника."""
     builder = InlineKeyboardBuilder()
@@ -76,6 +73,7 @@ def get_add_tech_method_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def get_back_button_keyboard() -> InlineKeyboardMarkup:
     """Простая клавиатура с кнопкой 'Назад'."""
     builder = InlineKeyboardBuilder()
@@ -104,41 +102,27 @@ def get_technician_view_keyboard(
     builder = InlineKeyboardBuilder()
 
     # Пагинация статистики (если больше 1 страницы)
+    nav_count = 0
     if total_pages > 1:
-        nav_buttons = []
-
         # Кнопка "Назад" по страницам
         if stats_page > 1:
-            nav_buttons.append(
-                {
-                    "text": "⬅️",
-                    "callback_data": f"admin_tech_page:{tech_id}:{stats_page - 1}"
-                }
+            builder.button(
+                text="⬅️",
+                callback_data=f"admin_tech_page:{tech_id}:{stats_page - 1}",
             )
+            nav_count += 1
 
         # Индикатор страницы
-        nav_buttons.append(
-            {
-                "text": f"{stats_page}/{total_pages}",
-                "callback_data": "noop"
-            }
-        )
+        builder.button(text=f"{stats_page}/{total_pages}", callback_data="noop")
+        nav_count += 1
 
         # Кнопка "Вперед" по страницам
         if stats_page < total_pages:
-            nav_buttons.append(
-                {
-                    "text": "➡️",
-                    "callback_data": f"admin_tech_page:{tech_id}:{stats_page + 1}"
-                }
+            builder.button(
+                text="➡️",
+                callback_data=f"admin_tech_page:{tech_id}:{stats_page + 1}",
             )
-
-        # Добавляем ряд пагинации
-        for btn in nav_buttons:
-            builder.button(text=btn["text"], callback_data=btn["callback_data"])
-
-        # Корректируем последний ряд
-        builder.adjust(len(nav_buttons))
+            nav_count += 1
 
     # Кнопки управления
     builder.button(
@@ -158,7 +142,11 @@ def get_technician_view_keyboard(
         callback_data="admin_back_to_tech_menu",
     )
 
-    builder.adjust(1)
+    # Пагинация одним рядом, остальные кнопки — по одной в строке
+    if nav_count:
+        builder.adjust(nav_count, 1)
+    else:
+        builder.adjust(1)
     return builder.as_markup()
 
 
@@ -1,17 +1,37 @@
 from __future__ import annotations
+from functools import lru_cache
+
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.types import InlineKeyboardMarkup
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 def technicians_kb(names: list[str]) -> InlineKeyboardMarkup:
-    kb = InlineKeyboardBuilder()
-    for n in names:
-        kb.button(text=f"Назначить: {n.title()}", callback_data=f"assign:{n.lower()}")
-    kb.adjust(1)
-    return kb.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"Назначить: {n.title()}", callback_data=f"assign:{n.lower()}")]
+        for n in names
+    ])
 
 def close_ticket_kb(ticket_id: int) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     kb.button(text="Закрыть тикет", callback_data=f"close:{ticket_id}")
     return kb.as_markup()
 
+@lru_cache(maxsize=1024)
+def status_kb(ticket_id: int) -> InlineKeyboardMarkup:
+    """
+    Кнопки управления статусом тикета: [🟡 В работе] [⚪️ Закрыть].
 
+    Клавиатура не меняется после создания, поэтому один экземпляр
+    на тикет переиспользуется между главной группой и тех-топиком.
+    """
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[
+            InlineKeyboardButton(
+                text="🟡 В работе",
+                callback_data=f"status_work:{ticket_id}",
+            ),
+            InlineKeyboardButton(
+                text="⚪️ Закрыть",
+                callback_data=f"status_close:{ticket_id}",
+            ),
+        ]]
+    )
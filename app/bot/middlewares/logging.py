@@ -16,27 +16,31 @@ class LoggingMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
 
-        start_time = time.time()
+        start_time = time.monotonic()
 
         try:
-            if isinstance(event, Message):
-                user_info = f"@{event.from_user.username}" if event.from_user.username else f"ID:{event.from_user.id}"
-                text = event.text or event.caption or "[медиа]"
-                logger.info(f"📩 Сообщение от {user_info}: {text}")
-
-            elif isinstance(event, CallbackQuery):
-                user_info = f"@{event.from_user.username}" if event.from_user.username else f"ID:{event.from_user.id}"
-                logger.info(f"🔘 Callback от {user_info}: {event.data}")
+            # Строку о событии собираем только если INFO включён
+            if logger.isEnabledFor(logging.INFO):
+                if isinstance(event, Message):
+                    user = event.from_user
+                    user_info = f"@{user.username}" if user.username else f"ID:{user.id}"
+                    text = event.text or event.caption or "[медиа]"
+                    logger.info("📩 Сообщение от %s: %s", user_info, text)
+
+                elif isinstance(event, CallbackQuery):
+                    user = event.from_user
+                    user_info = f"@{user.username}" if user.username else f"ID:{user.id}"
+                    logger.info("🔘 Callback от %s: %s", user_info, event.data)
 
             result = await handler(event, data)
 
-            execution_time = time.time() - start_time
+            execution_time = time.monotonic() - start_time
             if execution_time > 1.0:
-                logger.warning(f"⏱️ Медленная операция: {execution_time:.2f}s")
+                logger.warning("⏱️ Медленная операция: %.2fs", execution_time)
 
             return result
 
         except Exception as e:
-            execution_time = time.time() - start_time
-            logger.error(f"❌ Ошибка при обработке события за {execution_time:.2f}s: {e}")
-            raise
\ No newline at end of file
+            execution_time = time.monotonic() - start_time
+            logger.error("❌ Ошибка при обработке события за %.2fs: %s", execution_time, e)
+            raise
@@ -0,0 +1,94 @@
+# app/bot/middlewares/rate_limit.py
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetUpdates, Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramRateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Общий лимит исходящих запросов к Bot API.
+
+    Вешается на bot.session, поэтому покрывает все вызовы бота
+    (send_*, copy_message, close_forum_topic и т.д.):
+      • token bucket: не больше `rate` запросов в секунду с запасом `burst`;
+      • при 429 (TelegramRetryAfter) ставит на паузу ВСЕ запросы на
+        retry_after секунд и повторяет упавший запрос.
+
+    getUpdates (long polling) не лимитируется: он висит до timeout и
+    занимал бы токены, ничего не отправляя.
+    """
+
+    def __init__(self, rate: float = 30.0, burst: int = 30, max_retries: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+
+        self._tokens: float = float(burst)
+        self._updated_at: float = 0.0
+        self._paused_until: float = 0.0
+
+    async def _acquire(self) -> None:
+        """Дождаться паузы после 429 и свободного токена."""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            now = loop.time()
+
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            if self._updated_at:
+                self._tokens = min(
+                    float(self.burst),
+                    self._tokens + (now - self._updated_at) * self.rate,
+                )
+            self._updated_at = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if isinstance(method, GetUpdates):
+            return await make_request(bot, method)
+
+        attempt = 0
+
+        while True:
+            await self._acquire()
+
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                loop = asyncio.get_running_loop()
+                self._paused_until = max(self._paused_until, loop.time() + e.retry_after)
+
+                if attempt >= self.max_retries:
+                    raise
+
+                attempt += 1
+                logger.warning(
+                    "⏳ 429 на %s: пауза всех запросов %ss (попытка %s/%s)",
+                    type(method).__name__,
+                    e.retry_after,
+                    attempt,
+                    self.max_retries,
+                )
@@ -10,6 +10,9 @@ class DBSessionMiddleware(BaseMiddleware):
     Открывает AsyncSession на время обработки одного апдейта
     и гарантированно закрывает её (возвращает коннект в пул).
     Достаётся в хэндлерах через параметр `session: AsyncSession`.
+
+    Сессия ленивая: соединение берётся из пула только на первом запросе,
+    поэтому апдейты, которые не ходят в БД, пул не трогают.
     """
     async def __call__(
         self,
@@ -19,8 +22,4 @@ class DBSessionMiddleware(BaseMiddleware):
     ) -> Any:
         async with AsyncSessionLocal() as session:  # контекст => close() гарантирован
             data["session"] = session
-            try:
-                return await handler(event, data)
-            finally:
-                # Явное закрытие на случай, если кто-то захватил соединение
-                await session.close()
+            return await handler(event, data)
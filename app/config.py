@@ -75,7 +75,11 @@ class Settings(BaseSettings):
 
     # 🔹 Внутренние кешированные поля (не из .env)
     _admin_ids: list[int] | None = None
+    _admin_id_set: frozenset[int] = frozenset()
     _tech_groups_mapping: dict[str, int] | None = None
+    _db_dsn: str = ""
+    _is_dev: bool = False
+    _is_prod: bool = False
 
     @model_validator(mode="after")
     def parse_complex_fields(self):
@@ -109,6 +113,9 @@ class Settings(BaseSettings):
         else:
             self._admin_ids = []
 
+        # Множество для is_admin: проверка на каждом апдейте, O(1)
+        self._admin_id_set = frozenset(self._admin_ids)
+
         # 🔹 Парсинг tech_groups_mapping
         raw_mapping = self.tech_groups_mapping_raw.strip()
         if raw_mapping:
@@ -123,6 +130,15 @@ class Settings(BaseSettings):
         else:
             self._tech_groups_mapping = {}
 
+        # 🔹 Режим и DSN: считаем один раз, дальше свойства только читают
+        env = self.app_env.lower()
+        self._is_dev = env == "dev"
+        self._is_prod = env == "prod"
+        if self.use_sqlite or self._is_dev:
+            self._db_dsn = self.sqlite_path
+        else:
+            self._db_dsn = f"postgresql+asyncpg://{self.pg_user}:{self.pg_password}@{self.pg_host}:{self.pg_port}/{self.pg_db}"
+
         return self
 
     def get_admin_ids(self) -> list[int]:
@@ -133,7 +149,7 @@ class Settings(BaseSettings):
 
     def is_admin(self, user_id: int) -> bool:
         """Проверка, является ли пользователь админом."""
-        return user_id in self.get_admin_ids()
+        return user_id in self._admin_id_set
 
     @property
     def tech_groups_mapping(self) -> dict[str, int]:
@@ -145,24 +161,21 @@ class Settings(BaseSettings):
     @property
     def db_dsn(self) -> str:
         """Получить DSN для подключения к БД."""
-        if self.use_sqlite or self.app_env.lower() == "dev":
-            return self.sqlite_path
-        return f"postgresql+asyncpg://{self.pg_user}:{self.pg_password}@{self.pg_host}:{self.pg_port}/{self.pg_db}"
+        return self._db_dsn
 
     @property
     def is_dev(self) -> bool:
         """Проверка режима разработки."""
-        return self.app_env.lower() == "dev"
+        return self._is_dev
 
     @property
     def is_prod(self) -> bool:
         """Проверка production режима."""
-        return self.app_env.lower() == "prod"
+        return self._is_prod
 
     @property
     def use_redis(self) -> bool:
         """Использовать ли Redis (только в prod)."""
-        return self.is_prod
-
+        return self._is_prod
 
 settings = Settings()
\ No newline at end of file
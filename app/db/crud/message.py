@@ -2,11 +2,11 @@
 from __future__ import annotations
 
 from typing import Sequence
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import raiseload, selectinload
 
-from app.db.models import TicketMessage, Ticket
+from app.db.models import TicketMessage, Event, Actor, User
 from app.utils.session_decorator import with_session
 from app.utils.cache import cache
 
@@ -14,6 +14,27 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Размер первой страницы сообщений тикета, ID которой держим в кеше
+CACHED_PAGE_SIZE = 100
+
+
+def _message_load_options(with_relations: bool) -> list:
+    """
+    Опции загрузки связей TicketMessage.
+
+    По умолчанию user/ticket не грузятся (в модели они lazy="joined" и
+    тянули бы полные строки через LEFT OUTER JOIN) — raiseload. С
+    with_relations=True — отдельным selectin-запросом и только нужные колонки.
+    """
+    if not with_relations:
+        return [raiseload("*")]
+    return [
+        selectinload(TicketMessage.user)
+        .load_only(User.username, User.first_name, User.last_name)
+        .raiseload("*"),
+        selectinload(TicketMessage.ticket).raiseload("*"),
+    ]
+
 
 # ─────────────────────────────────────────────────────────────
 # CREATE
@@ -49,6 +70,72 @@ async def add_message(
     Returns:
         Созданное сообщение
     """
+    # Один INSERT ... RETURNING вместо add() + flush() + refresh()
+    stmt = (
+        insert(TicketMessage)
+        .values(
+            ticket_id=ticket_id,
+            user_id=user_id,
+            message_text=message_text or "",
+            is_from_admin=is_from_admin,
+            has_media=bool(media_type and media_file_id),
+            media_type=media_type,
+            media_file_id=media_file_id,
+            media_caption=media_caption,
+            telegram_message_id=telegram_message_id,
+        )
+        .returning(TicketMessage)
+    )
+    result = await session.execute(stmt)
+    message = result.scalar_one()
+
+    # Инвалидируем кеш сообщений тикета
+    await cache.invalidate_ticket_messages(ticket_id)
+
+    logger.info(
+        f"✅ Добавлено сообщение #{message.id} к тикету #{ticket_id} "
+        f"(от {'админа' if is_from_admin else 'клиента'})"
+    )
+
+    return message
+
+
+@with_session
+async def add_message_and_event(
+    session: AsyncSession,
+    *,
+    ticket_id: int,
+    user_id: int,
+    message_text: str,
+    actor: Actor,
+    action: str,
+    event_payload: dict | None = None,
+    is_from_admin: bool = False,
+    media_type: str | None = None,
+    media_file_id: str | None = None,
+    media_caption: str | None = None,
+    telegram_message_id: int | None = None,
+) -> tuple[TicketMessage, Event]:
+    """
+    Добавить сообщение к тикету и событие о нём за один flush.
+
+    Args:
+        session: DB сессия
+        ticket_id: ID тикета
+        user_id: Telegram ID пользователя (клиент или админ)
+        message_text: Текст сообщения
+        actor: Кто совершил действие (для Event)
+        action: Тип события, например 'client_message'
+        event_payload: Данные события
+        is_from_admin: True если от поддержки
+        media_type: Тип медиа (photo, video, document, voice)
+        media_file_id: file_id из Telegram
+        media_caption: Подпись к медиа
+        telegram_message_id: ID сообщения в Telegram
+
+    Returns:
+        (сообщение, событие)
+    """
     message = TicketMessage(
         ticket_id=ticket_id,
         user_id=user_id,
@@ -60,33 +147,26 @@ async def add_message(
         media_caption=media_caption,
         telegram_message_id=telegram_message_id,
     )
-
-    session.add(message)
+    event = Event(
+        ticket_id=ticket_id,
+        actor=actor,
+        action=action,
+        payload=event_payload,
+    )
+    session.add_all([message, event])
     await session.flush()
-    await session.refresh(message)
 
     # Инвалидируем кеш сообщений тикета
-    await cache.delete(f"messages:ticket:{ticket_id}")
-
-    # Обновляем счетчик сообщений в тикете
-    stmt = select(Ticket).where(Ticket.id == ticket_id)
-    result = await session.execute(stmt)
-    ticket = result.scalar_one_or_none()
-
-    if ticket:
-        if hasattr(ticket, 'messages_count'):
-            ticket.messages_count = (ticket.messages_count or 0) + 1
-        if hasattr(ticket, 'last_message_at'):
-            from datetime import datetime
-            ticket.last_message_at = datetime.utcnow()
-        await session.flush()
+    await cache.invalidate_ticket_messages(ticket_id)
 
     logger.info(
-        f"✅ Добавлено сообщение #{message.id} к тикету #{ticket_id} "
-        f"(от {'админа' if is_from_admin else 'клиента'})"
+        "✅ Добавлено сообщение #%s и событие '%s' к тикету #%s",
+        message.id,
+        action,
+        ticket_id,
     )
 
-    return message
+    return message, event
 
 
 # ─────────────────────────────────────────────────────────────
@@ -98,9 +178,10 @@ async def get_ticket_messages(
     session: AsyncSession,
     ticket_id: int,
     *,
-    limit: int = 100,
+    limit: int = CACHED_PAGE_SIZE,
     offset: int = 0,
     use_cache: bool = True,
+    with_relations: bool = False,
 ) -> Sequence[TicketMessage]:
     """
     Получить сообщения тикета с кешированием.
@@ -111,29 +192,34 @@ async def get_ticket_messages(
         limit: Максимум сообщений
         offset: Смещение для пагинации
         use_cache: Использовать ли кеш
+        with_relations: Подгрузить user и ticket
 
     Returns:
         Список сообщений
     """
-    # Пытаемся получить из кеша (только для первой страницы)
-    if use_cache and offset == 0 and limit <= 100:
-        cache_key = f"messages:ticket:{ticket_id}"
-        cached = await cache.get(cache_key)
-
-        if cached:
-            logger.debug(f"📦 Сообщения тикета #{ticket_id} из кеша")
-            # Преобразуем обратно в объекты (упрощенно)
-            # В реальности лучше хранить только ID и делать запрос
-            return cached
+    # Кешируется только первая страница целиком (CACHED_PAGE_SIZE) и только ID:
+    # при попадании строки дочитываем одним SELECT ... WHERE id IN (...)
+    cacheable = use_cache and offset == 0 and limit <= CACHED_PAGE_SIZE
+
+    if cacheable:
+        ids = await cache.get_ticket_message_ids(ticket_id)
+
+        if ids is not None:
+            logger.debug("📦 ID сообщений тикета #%s из кеша", ticket_id)
+            stmt = (
+                select(TicketMessage)
+                .where(TicketMessage.id.in_(ids[:limit]))
+                .options(*_message_load_options(with_relations))
+                .order_by(TicketMessage.created_at.asc())
+            )
+            result = await session.execute(stmt)
+            return result.scalars().all()
 
     # Запрос к БД
     stmt = (
         select(TicketMessage)
         .where(TicketMessage.ticket_id == ticket_id)
-        .options(
-            joinedload(TicketMessage.user),
-            joinedload(TicketMessage.ticket),
-        )
+        .options(*_message_load_options(with_relations))
         .order_by(TicketMessage.created_at.asc())
         .offset(offset)
         .limit(limit)
@@ -142,23 +228,9 @@ async def get_ticket_messages(
     result = await session.execute(stmt)
     messages = result.scalars().all()
 
-    # Кешируем на 5 минут (только первую страницу)
-    if use_cache and offset == 0 and messages:
-        cache_key = f"messages:ticket:{ticket_id}"
-        # Сохраняем упрощенные данные
-        cache_data = [
-            {
-                "id": m.id,
-                "user_id": m.user_id,
-                "message_text": m.message_text,
-                "is_from_admin": m.is_from_admin,
-                "has_media": m.has_media,
-                "media_type": m.media_type,
-                "created_at": m.created_at.isoformat() if m.created_at else None,
-            }
-            for m in messages
-        ]
-        await cache.set(cache_key, cache_data, expire=300)
+    # Кешируем на 5 минут; меньшая страница не годится для ответа на большую
+    if cacheable and limit == CACHED_PAGE_SIZE:
+        await cache.set_ticket_message_ids(ticket_id, [m.id for m in messages])
 
     return messages
 
@@ -167,6 +239,8 @@ async def get_ticket_messages(
 async def get_last_message(
     session: AsyncSession,
     ticket_id: int,
+    *,
+    with_relations: bool = False,
 ) -> TicketMessage | None:
     """
     Получить последнее сообщение тикета.
@@ -174,6 +248,7 @@ async def get_last_message(
     Args:
         session: DB сессия
         ticket_id: ID тикета
+        with_relations: Подгрузить user и ticket
 
     Returns:
         Последнее сообщение или None
@@ -181,10 +256,7 @@ async def get_last_message(
     stmt = (
         select(TicketMessage)
         .where(TicketMessage.ticket_id == ticket_id)
-        .options(
-            joinedload(TicketMessage.user),
-            joinedload(TicketMessage.ticket),
-        )
+        .options(*_message_load_options(with_relations))
         .order_by(desc(TicketMessage.created_at))
         .limit(1)
     )
@@ -227,6 +299,7 @@ async def get_messages_by_user(
     *,
     limit: int = 50,
     offset: int = 0,
+    with_relations: bool = False,
 ) -> Sequence[TicketMessage]:
     """
     Получить сообщения пользователя (для истории).
@@ -236,6 +309,7 @@ async def get_messages_by_user(
         user_id: Telegram ID пользователя
         limit: Максимум сообщений
         offset: Смещение
+        with_relations: Подгрузить user и ticket
 
     Returns:
         Список сообщений
@@ -243,10 +317,7 @@ async def get_messages_by_user(
     stmt = (
         select(TicketMessage)
         .where(TicketMessage.user_id == user_id)
-        .options(
-            joinedload(TicketMessage.ticket),
-            joinedload(TicketMessage.user),
-        )
+        .options(*_message_load_options(with_relations))
         .order_by(desc(TicketMessage.created_at))
         .offset(offset)
         .limit(limit)
@@ -287,7 +358,7 @@ async def delete_message(
     await session.flush()
 
     # Инвалидируем кеш
-    await cache.delete(f"messages:ticket:{ticket_id}")
+    await cache.invalidate_ticket_messages(ticket_id)
 
     logger.info(f"🗑 Удалено сообщение #{message_id} из тикета #{ticket_id}")
 
@@ -305,6 +376,7 @@ class TicketMessageCRUD:
 
     # CREATE
     add_message = staticmethod(add_message)
+    add_message_and_event = staticmethod(add_message_and_event)
 
     # READ
     get_ticket_messages = staticmethod(get_ticket_messages)
@@ -6,11 +6,12 @@ from datetime import datetime, time
 from sqlalchemy import func, select, desc
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, raiseload
 from zoneinfo import ZoneInfo
 
 from app.config import settings
 from app.db.models import Technician, Feedback, TechThread
+from app.utils.cache import cache
 from app.utils.session_decorator import with_session
 
 logger = logging.getLogger(__name__)
@@ -82,6 +83,7 @@ async def upsert_technician(
             changed = True
         if changed:
             await session.flush()
+            await cache.invalidate_technicians()
         return tech
 
     tech = Technician(
@@ -92,6 +94,7 @@ async def upsert_technician(
     )
     session.add(tech)
     await session.flush()
+    await cache.invalidate_technicians()
     return tech
 
 
@@ -122,6 +125,7 @@ async def deactivate_technician_by_id(
     if tech.is_active:
         tech.is_active = False
         await session.flush()
+        await cache.invalidate_technicians()
     return True
 
 
@@ -224,6 +228,7 @@ async def update_technician_name(
 
     tech.name = new_name
     await session.flush()
+    await cache.invalidate_technicians()
 
     return True
 
@@ -268,6 +273,9 @@ async def get_auto_assign_technician_for_now(
 
     Сейчас берём ПЕРВОГО подходящего активного техника.
     При необходимости можно усложнить (по нагрузке, round-robin и т.д.).
+
+    Возвращается полная строка техника (name, group_chat_id и т.д.),
+    повторно читать его по id не нужно. Связи не грузятся (raiseload).
     """
     if now is None:
         now = datetime.now(ZoneInfo(settings.timezone))
@@ -282,6 +290,7 @@ async def get_auto_assign_technician_for_now(
             Technician.auto_assign_end_hour.is_not(None),
         )
         .order_by(Technician.id.asc())
+        .options(raiseload("*"))
     )
     res = await session.execute(stmt)
     techs = res.scalars().all()
@@ -384,8 +393,8 @@ async def get_or_create_tech_thread(
             )
             # вложенная транзакция будет откатана автоматически
         else:
-            # всё ок, запись создалась
-            await session.refresh(thread)
+            # всё ок, запись создалась: id пришёл из RETURNING, created_at
+            # проставлен на стороне Python — refresh() не нужен
             return thread
 
     # 3) Если мы здесь — была IntegrityError, перечитываем существующую запись
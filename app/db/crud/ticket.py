@@ -4,7 +4,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Sequence, Iterable
 
-from sqlalchemy import select, func
+from sqlalchemy import insert, select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, joinedload
 
@@ -67,16 +67,22 @@ async def create_ticket(
       - main_thread_id — ID топика (thread) в этом чате, если есть
 
     При создании сразу пишем Event 'ticket_created' с initial_comment (если есть).
+    Техника (если уже известен) передаём сразу — без отдельного UPDATE.
     """
-    ticket = Ticket(
-        client_tg_id=client_tg_id,
-        main_chat_id=main_chat_id,
-        main_thread_id=main_thread_id,
-        assigned_tech_id=assigned_tech_id,
-        status=TicketStatus.NEW,
+    # Один INSERT ... RETURNING вместо add() + flush() + refresh()
+    stmt = (
+        insert(Ticket)
+        .values(
+            client_tg_id=client_tg_id,
+            main_chat_id=main_chat_id,
+            main_thread_id=main_thread_id,
+            assigned_tech_id=assigned_tech_id,
+            status=TicketStatus.NEW,
+        )
+        .returning(Ticket)
     )
-    session.add(ticket)
-    await session.flush()  # получаем ticket.id
+    result = await session.execute(stmt)
+    ticket = result.scalar_one()
 
     payload: dict = {}
     if initial_comment:
@@ -92,8 +98,6 @@ async def create_ticket(
         payload=payload or None,
     )
 
-    # ticket уже в сессии, но на всякий случай обновим
-    await session.refresh(ticket)
     return ticket
 
 
@@ -526,6 +530,21 @@ async def create_feedback(
     return fb
 
 
+@with_session
+async def create_feedbacks_bulk(
+    session: AsyncSession,
+    rows: Sequence[dict],
+) -> None:
+    """
+    Вставить пачку отзывов одним INSERT (executemany).
+    Каждый элемент rows — словарь с колонками Feedback
+    (ticket_id, tech_id, q1..q5, comment).
+    """
+    if not rows:
+        return
+    await session.execute(insert(Feedback), list(rows))
+
+
 @with_session
 async def get_feedback_for_ticket(
     session: AsyncSession,
@@ -598,8 +617,9 @@ async def add_event(
         payload=payload,
     )
     session.add(ev)
+    # id приходит из INSERT ... RETURNING, ts ставится на стороне Python —
+    # refresh() был лишним SELECT'ом
     await session.flush()
-    await session.refresh(ev)
     return ev
 
 
@@ -659,6 +679,7 @@ class TicketCRUD:
 
     # feedback
     create_feedback = staticmethod(create_feedback)
+    create_feedbacks_bulk = staticmethod(create_feedbacks_bulk)
     get_feedback_for_ticket = staticmethod(get_feedback_for_ticket)
     list_feedbacks_for_technician = staticmethod(list_feedbacks_for_technician)
 
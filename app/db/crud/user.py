@@ -5,6 +5,8 @@ from datetime import datetime
 from typing import Optional
 
 from sqlalchemy import select, or_, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import IntegrityError
@@ -29,7 +31,7 @@ async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int) -> Optiona
         select(User)
         .options(
             selectinload(User.topics),
-            selectinload(User.tickets).selectinload(Ticket.assigned_tech),
+            selectinload(User.tickets).joinedload(Ticket.assigned_tech),
         )
         .where(User.tg_id == telegram_id)
     )
@@ -48,7 +50,7 @@ async def get_user_by_username(db: AsyncSession, username: str | None) -> Option
         select(User)
         .options(
             selectinload(User.topics),
-            selectinload(User.tickets).selectinload(Ticket.assigned_tech),
+            selectinload(User.tickets).joinedload(Ticket.assigned_tech),
         )
         .where(func.lower(User.username) == normalized)
     )
@@ -147,6 +149,13 @@ async def create_user(
         raise
 
 
+def _dialect_insert(db: AsyncSession):
+    """insert() с поддержкой ON CONFLICT для диалекта сессии (Postgres в prod, SQLite в dev)."""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite_insert
+    return pg_insert
+
+
 async def get_or_create_user(
     db: AsyncSession,
     telegram_id: int,
@@ -157,32 +166,30 @@ async def get_or_create_user(
     """
     Быстрый хелпер: найти или создать.
     Обновляет username/имя, если изменились.
-    """
-    user = await get_user_by_telegram_id(db, telegram_id)
-    if user:
-        changed = False
-        # аккуратно обновим базовые поля
-        if username is not None:
-            new_username = username.lstrip("@")
-            if user.username != new_username:
-                user.username = new_username
-                changed = True
-        sf = sanitize_telegram_name(first_name)
-        sl = sanitize_telegram_name(last_name)
-        if sf is not None and sf != user.first_name:
-            user.first_name = sf
-            changed = True
-        if sl is not None and sl != user.last_name:
-            user.last_name = sl
-            changed = True
-
-        user.last_seen = datetime.utcnow()
-        if changed:
-            await db.flush()
-        # не обязательно коммитить немедленно (зависит от вызова)
-        return user
 
-    return await create_user(db, telegram_id, username=username, first_name=first_name, last_name=last_name)
+    Один INSERT ... ON CONFLICT DO UPDATE ... RETURNING вместо SELECT + INSERT/UPDATE.
+    Переданные None не затирают сохранённые значения. Коммит — на стороне вызывающего.
+    """
+    insert_ = _dialect_insert(db)
+    stmt = insert_(User).values(
+        tg_id=telegram_id,
+        username=(username.lstrip("@") if username is not None else None),
+        first_name=sanitize_telegram_name(first_name),
+        last_name=sanitize_telegram_name(last_name),
+        last_seen=datetime.utcnow(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.tg_id],
+        set_={
+            "username": func.coalesce(stmt.excluded.username, User.username),
+            "first_name": func.coalesce(stmt.excluded.first_name, User.first_name),
+            "last_name": func.coalesce(stmt.excluded.last_name, User.last_name),
+            "last_seen": stmt.excluded.last_seen,
+        },
+    ).returning(User)
+
+    result = await db.execute(stmt, execution_options={"populate_existing": True})
+    return result.scalar_one()
 
 
 async def update_user(db: AsyncSession, user: User, **kwargs) -> User:
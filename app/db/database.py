@@ -1,6 +1,7 @@
 # app/db/database.py
 from __future__ import annotations
 
+import asyncio
 import logging
 import time
 
@@ -41,12 +42,15 @@ if is_sqlite:
 else:
     poolclass = AsyncAdaptedQueuePool
     pool_kwargs = {
-        "pool_size": 20,
-        "max_overflow": 30,
+        "pool_size": 25,
+        "max_overflow": 25,
         "pool_timeout": 30,
-        "pool_recycle": 3600,
+        "pool_recycle": 1800,
         "pool_pre_ping": True,
         "pool_reset_on_return": "rollback",
+        # LIFO: основную нагрузку держат несколько «тёплых» соединений,
+        # лишние простаивают и закрываются по pool_recycle
+        "pool_use_lifo": True,
     }
     # Безопасные server_settings для Postgres (asyncpg)
     connect_args = {
@@ -101,6 +105,7 @@ class DatabaseManager:
     def __init__(self):
         self.engine = engine
         self.read_replica_engine: Optional[AsyncEngine] = None
+        self.read_replica_sessionmaker: Optional[async_sessionmaker[AsyncSession]] = None
 
         if hasattr(settings, 'DATABASE_READ_REPLICA_URL') and settings.DATABASE_READ_REPLICA_URL:
             self.read_replica_engine = create_async_engine(
@@ -111,17 +116,20 @@ class DatabaseManager:
                 pool_pre_ping=True,
                 echo=False,
             )
+            self.read_replica_sessionmaker = async_sessionmaker(
+                bind=self.read_replica_engine,
+                class_=AsyncSession,
+                expire_on_commit=False,
+                autoflush=False,
+            )
 
     @asynccontextmanager
     async def session(self, read_only: bool = False):
-        target_engine = self.read_replica_engine if (read_only and self.read_replica_engine) else self.engine
-
-        async_session = async_sessionmaker(
-            bind=target_engine,
-            class_=AsyncSession,
-            expire_on_commit=False,
-            autoflush=False,
-        )
+        # Фабрики создаются один раз, а не на каждый вызов
+        if read_only and self.read_replica_sessionmaker:
+            async_session = self.read_replica_sessionmaker
+        else:
+            async_session = AsyncSessionLocal
 
         async with async_session() as session:
             try:
@@ -172,6 +180,25 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
 # INITIALIZATION AND CLEANUP
 # ============================================================================
 
+async def warm_up_pool() -> None:
+    """Заранее открыть pool_size соединений, чтобы первые апдейты не ждали коннекта."""
+    if is_sqlite:
+        return
+
+    async def _touch() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # Соединения держатся одновременно, поэтому пул открывает их все
+    size = pool_kwargs["pool_size"]
+    results = await asyncio.gather(*(_touch() for _ in range(size)), return_exceptions=True)
+    failed = sum(isinstance(r, Exception) for r in results)
+    if failed:
+        logger.warning(f"⚠️ Прогрев пула: не удалось открыть {failed} из {size} соединений")
+    else:
+        logger.info(f"🔥 Пул БД прогрет: {size} соединений")
+
+
 async def init_db():
     """Инициализация БД с оптимизациями"""
     logger.info("🚀 Создание таблиц базы данных...")
@@ -187,6 +214,8 @@ async def init_db():
 
     logger.info("✅ База данных успешно инициализирована")
 
+    await warm_up_pool()
+
     health = await db_manager.health_check()
     logger.info(f"📊 Database health: {health}")
 
@@ -159,6 +159,9 @@ class Ticket(Base):
     closed_at:  Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
     # Одиночные ссылки → joined (удобно для отображения списка тикетов с клиентом/техом)
+    # omit_join не задаём: для many-to-one SQLAlchemy сам убирает JOIN с tickets
+    # при selectinload(...) и грузит просто users/technicians WHERE pk IN (...).
+    # Явно допустимо только omit_join=False, которое эту оптимизацию выключит.
     client: Mapped["User"] = relationship(
         back_populates="tickets",
         lazy="joined",
@@ -186,6 +189,8 @@ class Ticket(Base):
     __table_args__ = (
         Index("ix_tickets_client_status", "client_tg_id", "status"),
         Index("ix_tickets_assigned_status", "assigned_tech_id", "status"),
+        # Последний тикет клиента (ORDER BY created_at DESC LIMIT 1) — обратный проход по индексу
+        Index("ix_tickets_client_created", "client_tg_id", "created_at"),
     )
 
 class TicketMessage(Base):
@@ -223,6 +228,17 @@ class TicketMessage(Base):
     ticket: Mapped["Ticket"] = relationship(back_populates="messages", lazy="joined")
     user: Mapped["User"] = relationship(lazy="joined")
 
+    __table_args__ = (
+        # Лента тикета (WHERE ticket_id ORDER BY created_at) без сортировки;
+        # INCLUDE — чтобы выборки только этих колонок шли index-only (в SQLite игнорируется)
+        Index(
+            "ix_ticket_messages_ticket_created",
+            "ticket_id",
+            "created_at",
+            postgresql_include=["user_id", "is_from_admin", "media_type"],
+        ),
+    )
+
     @property
     def is_user_message(self) -> bool:
         """Сообщение от клиента."""
@@ -0,0 +1,18 @@
+# app/utils/background.py
+"""Фоновые задачи хендлеров: запуск без ожидания и без потери ссылки."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Coroutine
+
+# Ссылки на фоновые задачи, чтобы их не собрал GC до завершения
+_background_tasks: set[asyncio.Task] = set()
+
+
+def run_in_background(coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+    """Запустить корутину фоном, сохранив ссылку на задачу до её завершения."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
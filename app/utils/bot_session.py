@@ -0,0 +1,37 @@
+"""HTTP session for Bot API calls with a connection pool tuned for bursts."""
+
+from __future__ import annotations
+
+from aiogram.client.session.aiohttp import AiohttpSession
+
+# Всего соединений и соединений к api.telegram.org
+POOL_LIMIT = 200
+POOL_LIMIT_PER_HOST = 100
+# Сколько секунд держим простаивающее keep-alive соединение (у aiohttp по умолчанию 15)
+KEEPALIVE_TIMEOUT = 75
+DNS_CACHE_TTL = 300
+
+
+class TunedAiohttpSession(AiohttpSession):
+    """
+    AiohttpSession с настроенным пулом TCP-соединений.
+
+    Хэндлеры шлют пачки запросов через asyncio.gather; без keep-alive
+    и с малым лимитом на хост каждый такой запрос платит за новый
+    TCP/TLS-хендшейк. aiogram создаёт TCPConnector сам из _connector_init,
+    поэтому параметры пула дописываем туда.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(limit=POOL_LIMIT, **kwargs)
+        self._connector_init.update(
+            limit_per_host=POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            force_close=False,
+        )
+
+
+def new_bot_session() -> TunedAiohttpSession:
+    """Create the session for ``Bot(..., session=...)``."""
+    return TunedAiohttpSession()
@@ -6,6 +6,7 @@ from datetime import timedelta
 import redis.asyncio as redis
 
 from app.config import settings
+from app.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +24,12 @@ class CacheService:
         self.redis_client: Optional[redis.Redis] = None
         self._connected = True
 
+        # Локальная копия маршрутов тех-топиков: (tech_chat_id, tech_thread_id) → маршрут
+        # TTL не больше, чем у ключа в Redis: другой процесс сбрасывает только Redis
+        self._tech_routes: TTLCache[tuple[int, int], dict] = TTLCache(maxsize=4096, ttl=60)
+        # Локальная копия списка активных техников (одна запись)
+        self._technicians: TTLCache[str, list[dict]] = TTLCache(maxsize=1, ttl=60)
+
     async def connect(self):
         """Подключение к Redis с fallback на dev режим."""
         # В dev режиме Redis не используется
@@ -95,16 +102,16 @@ class CacheService:
             logger.error(f"Ошибка записи в кеш {key}: {e}")
             return False
 
-    async def delete(self, key: str) -> bool:
-        """Удалить ключ из кеша."""
-        if not self._connected:
+    async def delete(self, *keys: str) -> bool:
+        """Удалить один или несколько ключей из кеша (одним DEL)."""
+        if not self._connected or not keys:
             return False
 
         try:
-            deleted = await self.redis_client.delete(key)
+            deleted = await self.redis_client.delete(*keys)
             return deleted > 0
         except Exception as e:
-            logger.error(f"Ошибка удаления из кеша {key}: {e}")
+            logger.error(f"Ошибка удаления из кеша {', '.join(keys)}: {e}")
             return False
 
     async def delete_pattern(self, pattern: str) -> int:
@@ -145,6 +152,48 @@ class CacheService:
             logger.error(f"Ошибка установки TTL для {key}: {e}")
             return False
 
+    async def hset(
+        self,
+        key: str,
+        field: str,
+        value: Any,
+        expire: Union[int, timedelta] = None
+    ) -> bool:
+        """Записать поле хеша; с expire — вместе с TTL ключа одним запросом."""
+        if not self._connected:
+            return False
+
+        try:
+            if isinstance(expire, timedelta):
+                expire = int(expire.total_seconds())
+
+            serialized_value = json.dumps(value, default=str)
+
+            if not expire:
+                await self.redis_client.hset(key, field, serialized_value)
+                return True
+
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.hset(key, field, serialized_value)
+                pipe.expire(key, expire)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка записи поля {field} в хеш {key}: {e}")
+            return False
+
+    async def hgetall(self, key: str) -> dict[str, Any]:
+        """Получить все поля хеша."""
+        if not self._connected:
+            return {}
+
+        try:
+            raw = await self.redis_client.hgetall(key)
+            return {field: json.loads(value) for field, value in raw.items()}
+        except Exception as e:
+            logger.error(f"Ошибка получения хеша {key}: {e}")
+            return {}
+
     async def increment(self, key: str, amount: int = 1) -> Optional[int]:
         """Инкремент значения."""
         if not self._connected:
@@ -166,15 +215,26 @@ class CacheService:
 
         Кешируется на 10 минут, т.к. техники добавляются редко,
         но список запрашивается при каждом создании тикета.
+        Сначала смотрим в память процесса, затем в Redis.
+        Элементы: {"id", "name"}
         """
-        return await self.get("technicians:active")
+        technicians = self._technicians.get("active")
+        if technicians is not None:
+            return technicians
+
+        technicians = await self.get("technicians:active")
+        if technicians is not None:
+            self._technicians.set("active", technicians)
+        return technicians
 
     async def set_technicians(self, technicians: list[dict]) -> bool:
-        """Закешировать список техников на 10 минут."""
+        """Закешировать список техников: в памяти на минуту, в Redis на 10 минут."""
+        self._technicians.set("active", technicians)
         return await self.set("technicians:active", technicians, expire=600)
 
     async def invalidate_technicians(self) -> bool:
         """Сбросить кеш техников после изменений."""
+        self._technicians.clear()
         return await self.delete("technicians:active")
 
     async def get_technician_group(self, tech_id: int) -> Optional[int]:
@@ -246,6 +306,56 @@ class CacheService:
         key = f"thread:tech:{tech_chat_id}:{tech_thread_id}"
         return await self.set(key, ticket_id, expire=3600)
 
+    async def get_tech_route(
+        self,
+        tech_chat_id: int,
+        tech_thread_id: int
+    ) -> Optional[dict]:
+        """
+        Получить маршрут зеркалирования для топика техника.
+
+        Используется при каждом сообщении от техника вместо чтения
+        TechThread + Ticket из БД. Сначала смотрим в память процесса,
+        затем в Redis.
+        Возвращает: {"ticket_id", "main_chat_id", "main_thread_id", "client_tg_id"}
+        """
+        route = self._tech_routes.get((tech_chat_id, tech_thread_id))
+        if route is not None:
+            return route
+
+        key = f"thread:tech:{tech_chat_id}:{tech_thread_id}:route"
+        route = await self.get(key)
+        if route is not None:
+            self._tech_routes.set((tech_chat_id, tech_thread_id), route)
+        return route
+
+    async def set_tech_route(
+        self,
+        tech_chat_id: int,
+        tech_thread_id: int,
+        route: dict
+    ) -> bool:
+        """
+        Закешировать маршрут: в памяти и в Redis на 1 минуту.
+
+        TTL короткий: топик техника может перейти к новому тикету клиента.
+        """
+        self._tech_routes.set((tech_chat_id, tech_thread_id), route)
+
+        key = f"thread:tech:{tech_chat_id}:{tech_thread_id}:route"
+        return await self.set(key, route, expire=60)
+
+    async def invalidate_tech_route(
+        self,
+        tech_chat_id: int,
+        tech_thread_id: int
+    ) -> bool:
+        """Сбросить маршрут топика техника (при перепривязке к тикету)."""
+        self._tech_routes.pop((tech_chat_id, tech_thread_id), None)
+
+        key = f"thread:tech:{tech_chat_id}:{tech_thread_id}:route"
+        return await self.delete(key)
+
     async def get_tech_thread_by_ticket(
         self,
         ticket_id: int,
@@ -280,6 +390,49 @@ class CacheService:
         pattern = f"ticket:{ticket_id}:*"
         return await self.delete_pattern(pattern)
 
+    # ═══════════════════════════════════════════════════════════
+    # ОПРОСЫ - защита от повторной отправки клиенту
+    # ═══════════════════════════════════════════════════════════
+
+    async def is_feedback_sent(self, ticket_id: int) -> bool:
+        """Отправлялся ли опрос по тикету."""
+        return bool(await self.get(f"feedback_sent:{ticket_id}"))
+
+    async def is_feedback_sent_in_topic(
+        self,
+        tech_chat_id: int,
+        tech_thread_id: int
+    ) -> bool:
+        """
+        Отправлялся ли опрос по тикету, к которому сейчас привязан топик техника.
+
+        Позволяет ответить на повторный /feed, не читая тикет из БД.
+        """
+        key = f"feedback_sent:topic:{tech_chat_id}:{tech_thread_id}"
+        return bool(await self.get(key))
+
+    async def mark_feedback_sent(
+        self,
+        ticket_id: int,
+        tech_chat_id: Optional[int] = None,
+        tech_thread_id: Optional[int] = None
+    ) -> None:
+        """Запомнить отправку опроса на 7 дней (по тикету и, если известен, по топику)."""
+        await self.set(f"feedback_sent:{ticket_id}", True, expire=7 * 24 * 3600)
+
+        if tech_chat_id and tech_thread_id:
+            key = f"feedback_sent:topic:{tech_chat_id}:{tech_thread_id}"
+            await self.set(key, True, expire=7 * 24 * 3600)
+
+    async def clear_feedback_sent_in_topic(
+        self,
+        tech_chat_id: int,
+        tech_thread_id: int
+    ) -> bool:
+        """Сбросить отметку топика (при перепривязке к новому тикету)."""
+        key = f"feedback_sent:topic:{tech_chat_id}:{tech_thread_id}"
+        return await self.delete(key)
+
     # ═══════════════════════════════════════════════════════════
     # АКТИВНЫЕ ТИКЕТЫ КЛИЕНТА - для быстрого доступа
     # ═══════════════════════════════════════════════════════════
@@ -303,17 +456,19 @@ class CacheService:
         key = f"user:{user_id}:active_ticket"
         return await self.delete(key)
 
-    async def get_ticket_messages_cached(
-        self,
-        ticket_id: int
-    ) -> list[dict] | None:
-        """Получить кешированные сообщения тикета."""
-        key = f"messages:ticket:{ticket_id}"
+    async def get_ticket_message_ids(self, ticket_id: int) -> list[int] | None:
+        """Получить кешированные ID сообщений первой страницы тикета."""
+        key = f"messages:ticket:{ticket_id}:ids"
         return await self.get(key)
 
+    async def set_ticket_message_ids(self, ticket_id: int, ids: list[int]) -> bool:
+        """Закешировать ID сообщений первой страницы тикета (5 минут)."""
+        key = f"messages:ticket:{ticket_id}:ids"
+        return await self.set(key, ids, expire=300)
+
     async def invalidate_ticket_messages(self, ticket_id: int) -> bool:
         """Сбросить кеш сообщений тикета."""
-        key = f"messages:ticket:{ticket_id}"
+        key = f"messages:ticket:{ticket_id}:ids"
         return await self.delete(key)
     # ═══════════════════════════════════════════════════════════
     # СТАТИСТИКА - для дашбордов и отчетов
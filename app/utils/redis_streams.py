@@ -1,7 +1,7 @@
 # app/utils/redis_streams.py
 import json
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 from redis.asyncio import Redis
 
@@ -63,7 +63,8 @@ class RedisStreamsManager:
         
         Args:
             payload: Словарь с данными для отправки
-                     ОБЯЗАТЕЛЬНО: bot_token, type, target_chat_id
+                     ОБЯЗАТЕЛЬНО: type, target_chat_id
+                     (токен бота воркер берёт из настроек, в payload его не кладём)
                      ОПЦИОНАЛЬНО: target_thread_id, text, file_id, caption, pin
         """
         if not self.redis:
@@ -79,6 +80,36 @@ class RedisStreamsManager:
         logger.debug(f"➕ Enqueued: {msg_id} → {payload.get('type')} to {payload.get('target_chat_id')}")
         return msg_id
 
+    async def enqueue_many(self, payloads: List[Dict[str, Any]]) -> List[str]:
+        """
+        Добавить несколько сообщений в очередь одним pipeline.
+
+        Все XADD уходят в Redis за один round-trip; порядок сообщений
+        в стриме совпадает с порядком в списке.
+
+        Args:
+            payloads: Список payload'ов (формат как у enqueue)
+
+        Returns:
+            ID добавленных сообщений
+        """
+        if not payloads:
+            return []
+
+        if not self.redis:
+            await self.connect()
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for payload in payloads:
+                pipe.xadd(
+                    name=STREAM_KEY,
+                    fields={"payload": json.dumps(payload, ensure_ascii=False)}
+                )
+            msg_ids = await pipe.execute()
+
+        logger.debug(f"➕ Enqueued batch: {len(msg_ids)} сообщений")
+        return msg_ids
+
     async def ack(self, message_id: str):
         """Подтвердить обработку сообщения"""
         await self.redis.xack(STREAM_KEY, GROUP, message_id)
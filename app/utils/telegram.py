@@ -0,0 +1,100 @@
+# app/utils/telegram.py
+"""Общие помощники над сообщениями Telegram для хендлеров."""
+
+from __future__ import annotations
+
+from operator import attrgetter
+
+from aiogram.types import Message
+
+from app.db.models import TicketStatus
+
+# Эмодзи статуса тикета (названия топиков, уведомления)
+STATUS_EMOJI: dict[TicketStatus, str] = {
+    TicketStatus.NEW: "🟢",
+    TicketStatus.WORK: "🟡",
+    TicketStatus.CLOSED: "⚪️",
+}
+
+# Поля служебных сообщений (создание/закрытие топиков, участники и т.п.)
+SERVICE_FIELDS: tuple[str, ...] = (
+    "forum_topic_created",
+    "forum_topic_closed",
+    "forum_topic_edited",
+    "forum_topic_reopened",
+    "general_forum_topic_hidden",
+    "general_forum_topic_unhidden",
+    "new_chat_members",
+    "left_chat_member",
+    "new_chat_title",
+    "new_chat_photo",
+    "delete_chat_photo",
+    "group_chat_created",
+    "supergroup_chat_created",
+    "channel_chat_created",
+    "migrate_to_chat_id",
+    "migrate_from_chat_id",
+    "pinned_message",
+    "message_auto_delete_timer_changed",
+    "video_chat_scheduled",
+    "video_chat_started",
+    "video_chat_ended",
+    "video_chat_participants_invited",
+)
+
+# Все поля читаются одним вызовом на уровне C, без сборки списка на каждое сообщение
+get_service_fields = attrgetter(*SERVICE_FIELDS)
+
+
+# Поддерживаемые типы медиа: (атрибут Message, сохранять ли подпись).
+# Порядок важен — берём первый найденный.
+MEDIA_SPECS: tuple[tuple[str, bool], ...] = (
+    ("photo", True),
+    ("video", True),
+    ("document", True),
+    ("voice", False),
+    ("audio", True),
+)
+
+
+class _ConsonantTable(dict):
+    """Таблица для str.translate: согласная → заглавная, всё остальное удаляется."""
+
+    def __missing__(self, key: int) -> None:
+        return None
+
+
+_CONSONANTS_TABLE = _ConsonantTable(
+    (ord(ch), ch.upper())
+    for ch in (
+        "БВГДЖЗЙКЛМНПРСТФХЦЧШЩбвгджзйклмнпрстфхцчшщ"
+        "BCDFGHJKLMNPQRSTVWXYZbcdfghjklmnpqrstvwxyz"
+    )
+)
+
+
+def extract_consonants(name: str, count: int = 3) -> str:
+    """Извлечь первые N согласных букв из имени."""
+    result = name.translate(_CONSONANTS_TABLE)[:count]
+
+    # Если не хватает согласных, возьмем первые буквы
+    if len(result) < 2:
+        result = "".join(c for c in name[:count] if c.isalpha()).upper()
+
+    return result[:count] or "???"
+
+
+def status_emoji(status: TicketStatus) -> str:
+    """Получить эмодзи статуса."""
+    return STATUS_EMOJI.get(status, "⚪️")
+
+
+def extract_media(message: Message) -> tuple[str | None, str | None, str | None]:
+    """Получить (media_type, file_id, caption) сообщения или (None, None, None)."""
+    for attr, with_caption in MEDIA_SPECS:
+        media = getattr(message, attr)
+        if media:
+            # photo — список размеров, берём самый большой
+            file_id = media[-1].file_id if attr == "photo" else media.file_id
+            return attr, file_id, message.caption if with_caption else None
+    return None, None, None
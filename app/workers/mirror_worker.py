@@ -5,7 +5,8 @@ Mirror Worker — FIFO per ticket. 10 parallel workers.
 - История тикета передаётся строго в порядке sequence_id
 - Живые сообщения (без sequence_id) отправляются сразу
 - Уведомления «Начата/Завершена пересылка» — только в главный топик клиента
-- Ни одна ClientSession не остаётся открытой (async with Bot)
+- Один Bot (и один пул соединений) на токен на весь процесс;
+  сессии закрываются при остановке воркера
 """
 
 import asyncio
@@ -19,6 +20,8 @@ from aiogram import Bot
 from aiogram.exceptions import TelegramRetryAfter, TelegramBadRequest, TelegramAPIError
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+from app.utils.bot_session import new_bot_session
+from app.utils.event_loop import new_event_loop
 from app.utils.redis_streams import redis_streams, STREAM_KEY, GROUP
 from app.config import settings
 
@@ -46,6 +49,34 @@ ticket_stats: Dict[int, Dict[str, Any]] = defaultdict(lambda: {
 
 ticket_in_progress: Dict[int, Optional[int]] = defaultdict(lambda: None)
 
+# token -> Bot: keep-alive соединения переживают отдельные сообщения
+_bots: Dict[str, Bot] = {}
+
+
+def _bot_token(payload: Dict[str, Any]) -> str:
+    """
+    Токен бота для отправки payload.
+
+    Бот и воркер читают один и тот же BOT_TOKEN, поэтому продюсеры его в
+    payload не кладут; поле учитывается только у старых сообщений в стриме.
+    """
+    return payload.get("bot_token") or settings.bot_token
+
+
+def _get_bot(token: str) -> Bot:
+    """Общий Bot для токена (создаётся при первом обращении)."""
+    bot = _bots.get(token)
+    if bot is None:
+        bot = _bots[token] = Bot(token=token, session=new_bot_session())
+    return bot
+
+
+async def _close_bots() -> None:
+    """Закрыть HTTP-сессии всех созданных ботов."""
+    for bot in _bots.values():
+        await bot.session.close()
+    _bots.clear()
+
 
 # ================================================================
 # Уведомления в главный топик клиента
@@ -55,16 +86,16 @@ async def notify_main_group(bot_token: str, main_chat_id: int, main_thread_id: i
     if not main_chat_id or not main_thread_id:
         return
 
-    async with Bot(token=bot_token) as bot:
-        try:
-            await bot.send_message(
-                chat_id=main_chat_id,
-                message_thread_id=main_thread_id,
-                text=text,
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            logger.error(f"❌ Ошибка уведомления в главный топик: {e}")
+    bot = _get_bot(bot_token)
+    try:
+        await bot.send_message(
+            chat_id=main_chat_id,
+            message_thread_id=main_thread_id,
+            text=text,
+            parse_mode="HTML"
+        )
+    except Exception as e:
+        logger.error(f"❌ Ошибка уведомления в главный топик: {e}")
 
 
 # ================================================================
@@ -212,12 +243,12 @@ async def send_payload(bot: Bot, payload: Dict[str, Any]) -> bool:
 # Обёртка с ретраями
 # ================================================================
 async def send_message_safe(payload: Dict[str, Any]) -> bool:
-    async with Bot(token=payload["bot_token"]) as bot:
-        while True:
-            ok = await send_payload(bot, payload)
-            if ok:
-                return True
-            await asyncio.sleep(0.3)
+    bot = _get_bot(_bot_token(payload))
+    while True:
+        ok = await send_payload(bot, payload)
+        if ok:
+            return True
+        await asyncio.sleep(0.3)
 
 
 # ================================================================
@@ -242,7 +273,7 @@ async def process_message_ordered(msg_id: str, payload: Dict[str, Any]) -> bool:
 
         # уведомление только в главный топик
         await notify_main_group(
-            bot_token=payload["bot_token"],
+            bot_token=_bot_token(payload),
             main_chat_id=settings.main_group_id,
             main_thread_id=payload.get("main_thread_id"),
             text=f"📤 <b>Начата пересылка истории</b>\nТикет #{ticket_id}"
@@ -295,7 +326,7 @@ async def process_message_ordered(msg_id: str, payload: Dict[str, Any]) -> bool:
         logger.info(f"🎉 Тикет #{ticket_id} завершён: {total} сообщений, {elapsed}s")
 
         await notify_main_group(
-            bot_token=payload["bot_token"],
+            bot_token=_bot_token(payload),
             main_chat_id=settings.main_group_id,
             main_thread_id=payload.get("main_thread_id"),
             text=(
@@ -389,6 +420,7 @@ async def mirror_worker():
         await asyncio.gather(*tasks, return_exceptions=True)
 
     finally:
+        await _close_bots()
         await redis_streams.disconnect()
 
 
@@ -398,4 +430,4 @@ if __name__ == "__main__":
         format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
     )
 
-    asyncio.run(mirror_worker())
+    asyncio.run(mirror_worker(), loop_factory=new_event_loop)
@@ -13,6 +13,7 @@ from app.config import settings
 from app.utils.cache import cache
 from app.utils.startup_timeline import StartupTimeline
 from app.utils.timezone import TimezoneAwareFormatter
+from app.utils.event_loop import new_event_loop
 from app.web.server import create_app
 from pathlib import Path
 
@@ -230,7 +231,7 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(main(), loop_factory=new_event_loop)
     except KeyboardInterrupt:
         print("\n🛑 Бот остановлен пользователем")
     except Exception as e: